@@ -0,0 +1,171 @@
+import json
+import os
+from datetime import datetime
+import pandas as pd
+from storage import write_atomic
+
+VALUE_COLUMNS = ["Units Sold", "Total Bill", "Profit"]
+GROUP_COLUMNS = ["Item Sold", "Sale Dealer"]
+PERIOD_NAMES = {"D": "Day", "W": "Week", "M": "YearMonth"}
+
+
+def period_key(date, freq="M"):
+    date = str(date)[:10]
+    if freq == "M":
+        return date[:7]
+    if freq == "D":
+        return date
+    if freq == "W":
+        year, week, _ = datetime.strptime(date, "%Y-%m-%d").isocalendar()
+        return f"{year}-W{week:02d}"
+    raise ValueError(f"Unknown period '{freq}' (expected 'D', 'W' or 'M')")
+
+
+def period_keys(dates, freq="M"):
+    dates = pd.to_datetime(dates.astype(str).str[:10])
+    if freq == "M":
+        return dates.dt.strftime("%Y-%m")
+    if freq == "D":
+        return dates.dt.strftime("%Y-%m-%d")
+    if freq == "W":
+        iso = dates.dt.isocalendar()
+        return iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)
+    raise ValueError(f"Unknown period '{freq}' (expected 'D', 'W' or 'M')")
+
+
+def apply(totals, rows):
+    # rows: [period, item, dealer, units, bill, profit, count] deltas
+    for row in rows:
+        key = tuple(row[:3])
+        values = [current + value for current, value in zip(totals.get(key, [0.0, 0.0, 0.0, 0.0]), row[3:])]
+        if values[3] <= 0:
+            totals.pop(key, None)
+        else:
+            totals[key] = values
+
+
+# Materialized sales totals per (period, item, dealer), persisted as JSON and
+# adjusted row by row on saves and deletes so reports never rescan the ledger.
+# Each change is appended to a small journal next to the file, which is folded
+# into the JSON every fold_every changes and on close, so a save costs the
+# same however many groups there are. marker() returns a token for the sale
+# ledger's current state; it is stored with every change, and totals that end
+# on another ledger state are not loaded.
+class SalesAggregates:
+    def __init__(self, path, freq="M", source="csv", marker=None, fold_every=1000):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".journal"
+        self.freq = freq
+        self.source = source
+        self.marker = marker
+        self.fold_every = fold_every
+        self.totals = {}
+        # Journal lines from another generation were already folded in
+        self.generation = 0
+        self.journaled = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("freq") != self.freq or data.get("source") != self.source:
+            return False
+        totals = {tuple(row[:3]): row[3:] for row in data.get("rows", [])}
+        generation, marker, journaled = data.get("generation", 0), data.get("marker"), 0
+        for entry in self.read_journal():
+            if entry.get("generation") == generation:
+                apply(totals, entry["rows"])
+                marker = entry["marker"]
+                journaled += 1
+        if self.marker is not None and marker != self.marker():
+            return False
+        self.totals, self.generation, self.journaled = totals, generation, journaled
+        return True
+
+    def read_journal(self):
+        # Stops at a line torn by a crash mid-append
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+
+    def save(self):
+        # Folds the journal in: the new generation is written first, so a
+        # crash before the journal is removed leaves only stale lines
+        rows = [list(key) + values for key, values in self.totals.items()]
+        marker = self.marker() if self.marker is not None else None
+        self.generation += 1
+        write_atomic(self.path, json.dumps({"freq": self.freq, "source": self.source, "generation": self.generation,
+                                            "marker": marker, "rows": rows}))
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.journaled = 0
+
+    def record(self, rows):
+        apply(self.totals, rows)
+        marker = self.marker() if self.marker is not None else None
+        line = json.dumps({"generation": self.generation, "marker": marker, "rows": rows}) + "\n"
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.journaled += 1
+        if self.journaled >= self.fold_every:
+            self.save()
+
+    def close(self):
+        if self.journaled:
+            self.save()
+
+    def group(self, sale_df):
+        df = sale_df[GROUP_COLUMNS + VALUE_COLUMNS].copy()
+        df["Period"] = period_keys(sale_df["Date"], self.freq)
+        df["Count"] = 1
+        grouped = df.groupby(["Period"] + GROUP_COLUMNS, sort=False, observed=True)[VALUE_COLUMNS + ["Count"]].sum()
+        for key, values in zip(grouped.index, grouped.itertuples(index=False, name=None)):
+            yield tuple(str(part) for part in key), [float(value) for value in values]
+
+    def build(self, sale_df):
+        self.totals = {}
+        if not sale_df.empty:
+            self.totals = dict(self.group(sale_df))
+        self.save()
+
+    def add_rows(self, sale_df):
+        if sale_df.empty:
+            return
+        self.record([list(key) + added for key, added in self.group(sale_df)])
+
+    def add_sale(self, row):
+        key = [period_key(row["Date"], self.freq), str(row["Item Sold"]), str(row["Sale Dealer"])]
+        self.record([key + [float(row[col]) for col in VALUE_COLUMNS] + [1.0]])
+
+    def remove_rows(self, sale_df):
+        if sale_df.empty:
+            return
+        self.record([list(key) + [-value for value in removed] for key, removed in self.group(sale_df)
+                     if key in self.totals])
+
+    def clear(self):
+        self.totals = {}
+        self.save()
+
+    def detail(self):
+        period = PERIOD_NAMES[self.freq]
+        rows = [list(key) + values[:3] for key, values in self.totals.items()]
+        df = pd.DataFrame(rows, columns=[period] + GROUP_COLUMNS + VALUE_COLUMNS)
+        df["Units Sold"] = df["Units Sold"].round().astype("int64")
+        return df.sort_values([period] + GROUP_COLUMNS).reset_index(drop=True)
+
+    def summary(self):
+        period = PERIOD_NAMES[self.freq]
+        df = self.detail()
+        return df.groupby(period)[VALUE_COLUMNS].sum().reset_index()
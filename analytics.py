@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+
+# Dimensions kept in each rollup, per table, and the measures summed over them
+DIMENSIONS = {
+    "sale": ["Item Sold", "Company", "Model", "Sale Dealer"],
+    "purchase": ["Item", "Company", "Model", "Dealer", "City"],
+}
+MEASURES = {
+    "sale": ["Units Sold", "Total Bill", "Profit"],
+    "purchase": ["Units Purchased", "Total Cost"],
+}
+# Report groupings offered by the dashboard; every rollup also carries the
+# month of its day, so grouping by month needs no date conversion
+GROUPINGS = {
+    "Item": {"sale": ["Item Sold"], "purchase": ["Item"]},
+    "Company": {"sale": ["Company"], "purchase": ["Company"]},
+    "Model": {"sale": ["Item Sold", "Company", "Model"], "purchase": ["Item", "Company", "Model"]},
+    "Dealer": {"sale": ["Sale Dealer"], "purchase": ["Dealer"]},
+    "City": {"purchase": ["City"]},
+    "Month": {"sale": ["Month"], "purchase": ["Month"]},
+}
+
+
+def parse_day(value):
+    # None or "" means an open end of the date range
+    if value is None or str(value).strip() == "":
+        return None
+    day = pd.to_datetime(str(value).strip()[:10], format="%Y-%m-%d", errors="coerce")
+    if pd.isna(day):
+        raise ValueError(f"Invalid date '{value}' (expected YYYY-MM-DD)")
+    return day
+
+
+def as_text(series):
+    # Keeps categoricals (as read from the ledger snapshot) categorical
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.rename_categories(series.cat.categories.astype(str))
+    return series.astype(str)
+
+
+def rollup(df, table, sign=1):
+    # One row per (day, dimensions) with summed measures and a record count
+    dims = DIMENSIONS[table]
+    frame = pd.DataFrame({"Day": pd.to_datetime(df["Date"].astype(str).str[:10], format="%Y-%m-%d", errors="coerce")})
+    for col in dims:
+        frame[col] = as_text(df[col])
+    if table == "purchase":
+        units = pd.to_numeric(df["Units Purchased"], errors="coerce")
+        frame["Units Purchased"] = units * sign
+        frame["Total Cost"] = pd.to_numeric(df["Price Per Unit"], errors="coerce") * units * sign
+    else:
+        for col in MEASURES[table]:
+            frame[col] = pd.to_numeric(df[col], errors="coerce") * sign
+    frame["Count"] = sign
+    return with_month(frame.groupby(["Day"] + dims, observed=True, dropna=False, sort=False).sum().reset_index())
+
+
+def with_month(cube):
+    cube["Month"] = cube["Day"].to_numpy().astype("datetime64[M]")
+    return cube
+
+
+def day_range(cube, start, end):
+    # Rows of a day-sorted cube within [start, end], by binary search
+    days = cube["Day"].to_numpy()
+    lo = 0 if start is None else int(np.searchsorted(days, start.to_datetime64(), side="left"))
+    hi = len(cube) if end is None else int(np.searchsorted(days, end.to_datetime64(), side="right"))
+    return cube.iloc[lo:hi]
+
+
+def compact(cube, table):
+    # Sorted by day for range lookups, with categorical dimensions
+    cube = cube.sort_values("Day", kind="stable").reset_index(drop=True)
+    for col in DIMENSIONS[table]:
+        cube[col] = cube[col].astype("category")
+    return cube
+
+
+# Cached day-level rollups of the purchase and sale ledgers for the analytics
+# dashboard. Each table's cube is built once, on first use, and sorted by day
+# so a date range is a binary search. Writes are queued as signed deltas and
+# folded into a small side cube on the next query; the side cube is merged
+# into the main one once it passes merge_every rows. Report results are
+# cached until the next write. Archived periods get a cube of their own, built
+# part by part and only once a report's range starts before the archive cutoff.
+# Not thread-safe: use from the writer thread.
+class Analytics:
+    def __init__(self, storage, archive=None, merge_every=5000, cache_size=64):
+        self.storage = storage
+        self.archive = archive
+        self.archive_cubes = {}
+        self.merge_every = merge_every
+        self.cache_size = cache_size
+        self.cubes = {}
+        self.deltas = {}
+        self.pending = {"sale": [], "purchase": []}
+        self.cache = {}
+
+    def invalidate(self):
+        # Rebuilt from the ledgers on the next report
+        self.cubes = {}
+        self.archive_cubes = {}
+        self.deltas = {}
+        self.pending = {"sale": [], "purchase": []}
+        self.cache = {}
+
+    def add_rows(self, table, rows, sign=1):
+        # rows: a list of record dicts or a DataFrame. Ignored until the cube
+        # exists, since building it reads the ledger anyway.
+        if table not in self.cubes:
+            return
+        if isinstance(rows, pd.DataFrame):
+            if rows.empty:
+                return
+            rows = rows.to_dict("records")
+        self.pending[table].extend((row, sign) for row in rows)
+        self.cache = {}
+
+    def remove_rows(self, table, rows):
+        self.add_rows(table, rows, sign=-1)
+
+    def cube(self, table):
+        if table not in self.cubes:
+            self.cubes[table] = compact(rollup(self.storage.read(table), table), table)
+            self.deltas.pop(table, None)
+            self.pending[table] = []
+        if self.pending[table]:
+            entries = self.pending[table]
+            self.pending[table] = []
+            for sign in (1, -1):
+                rows = [row for row, row_sign in entries if row_sign == sign]
+                if rows:
+                    delta = rollup(pd.DataFrame(rows), table, sign)
+                    self.deltas[table] = delta if table not in self.deltas else pd.concat(
+                        [self.deltas[table], delta], ignore_index=True)
+            if len(self.deltas.get(table, ())) >= self.merge_every:
+                self.merge(table)
+        return self.cubes[table], self.deltas.get(table)
+
+    def archive_cube(self, table):
+        if table not in self.archive_cubes:
+            cubes = [rollup(df, table) for df in self.archive.frames(table) if not df.empty]
+            self.archive_cubes[table] = compact(pd.concat(cubes, ignore_index=True), table) if cubes else None
+        return self.archive_cubes[table]
+
+    def merge(self, table):
+        dims = DIMENSIONS[table]
+        merged = pd.concat([self.cubes[table], self.deltas.pop(table)], ignore_index=True)
+        merged = merged.groupby(["Day"] + dims, observed=True, dropna=False, sort=False)[
+            MEASURES[table] + ["Count"]].sum().reset_index()
+        self.cubes[table] = compact(with_month(merged[merged["Count"] != 0].copy()), table)
+
+    def report(self, table, group, start=None, end=None, top=None):
+        if table not in DIMENSIONS:
+            raise ValueError(f"Unknown table '{table}' (expected 'purchase' or 'sale')")
+        if table not in GROUPINGS.get(group, {}):
+            raise ValueError(f"Cannot group {table}s by '{group}'")
+        start, end = parse_day(start), parse_day(end)
+        cube, delta = self.cube(table)
+        key = (table, group, start, end, top)
+        if key in self.cache:
+            return self.cache[key].copy()
+
+        parts = [day_range(cube, start, end)]
+        if self.archive is not None and self.archive.covers(start):
+            archived = self.archive_cube(table)
+            if archived is not None:
+                parts.append(day_range(archived, start, end))
+        if delta is not None:
+            mask = pd.Series(True, index=delta.index)
+            if start is not None:
+                mask &= delta["Day"] >= start
+            if end is not None:
+                mask &= delta["Day"] <= end
+            parts.append(delta[mask])
+        frame = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+        by = GROUPINGS[group][table]
+        measures = MEASURES[table]
+        result = frame.groupby(by, observed=True, dropna=False)[measures + ["Count"]].sum().reset_index()
+        if by == ["Month"]:
+            result["Month"] = result["Month"].dt.strftime("%Y-%m")
+        result = result[result["Count"] > 0]
+        if table == "purchase":
+            units = result["Units Purchased"].where(result["Units Purchased"] != 0)
+            result["Avg Unit Cost"] = (result["Total Cost"] / units).round(2)
+        else:
+            bill = result["Total Bill"].where(result["Total Bill"] != 0)
+            result["Margin %"] = (100 * result["Profit"] / bill).round(1)
+        result = result.rename(columns={"Count": "Records"})
+        if by == ["Month"]:
+            result = result.sort_values("Month")
+        else:
+            result = result.sort_values(measures[-1], ascending=False)
+        if top:
+            result = result.head(int(top))
+        result = result.reset_index(drop=True)
+        for col in ["Units Sold", "Units Purchased", "Records"]:
+            if col in result.columns:
+                result[col] = result[col].round().astype("int64")
+        if len(self.cache) >= self.cache_size:
+            self.cache = {}
+        self.cache[key] = result
+        return result.copy()
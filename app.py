@@ -1,82 +1,177 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, messagebox
-import pandas as pd
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import os
-from datetime import datetime
+import sys
+import argparse
+import threading
+from errors import ValidationError
+from worker import BackgroundWorker
+from metrics import metrics
+
+# pandas and the storage/core modules are imported by load_data on the worker
+# thread, so the window can appear before they are loaded
+STARTUP_TARGET_MS = 1000
+
+ELECTRONICS_ITEMS = [
+    "Laptop", "Washing Machine", "Juicer", "LED", "Iron",
+    "Air Fryer", "Blender", "Cooler", "Water Dispenser", "Steamer", "AC"
+]
+CITIES = ["Lahore", "Multan", "Faisalabad", "Karachi", "Islamabad"]
+ANALYTICS_GROUPS = ["Item", "Company", "Model", "Dealer", "City", "Month"]
 
 class AAA_TradersApp:
-    def __init__(self, root):
+    def __init__(self, root, storage_kind=None, server_url=None, costing=None):
         self.root = root
-        self.root.withdraw()  # Hide until splash is done
         self.PURCHASE_FILE = "purchase_data.csv"
         self.SALE_FILE = "sale_data.csv"
         self.MODEL_HISTORY_FILE = "model_history.csv"
-        self.ELECTRONICS_ITEMS = [
-            "Laptop", "Washing Machine", "Juicer", "LED", "Iron",
-            "Air Fryer", "Blender", "Cooler", "Water Dispenser", "Steamer", "AC"
-        ]
-        self.CITIES = ["Lahore", "Multan", "Faisalabad", "Karachi", "Islamabad"]
-        self.model_history = self.load_model_history()
-        self.create_csv_files()
+        self.MONTHLY_SALES_FILE = "monthly_sales.json"
+        self.ARCHIVE_DIR = "archive"
+        self.ELECTRONICS_ITEMS = list(ELECTRONICS_ITEMS)
+        self.CITIES = list(CITIES)
+        self.DB_FILE = "aaa_traders.db"
+        self.storage_kind = storage_kind or os.environ.get("AAA_STORAGE", "csv")
+        self.server_url = server_url or os.environ.get("AAA_SERVER")
+        self.costing = costing or os.environ.get("AAA_COSTING", "fifo")
+        self.core = None
+        self.load_error = None
+        self.loaded = threading.Event()
+        self.startup_times = {}
+        self.splash = None
         self.setup_main_window()
         self.create_widgets()
+        self.worker = BackgroundWorker(self.root, on_busy=self.set_busy)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.show_splash()
+        self.root.after_idle(self.mark_window_ready)
+        # First job on the writer thread, so saves queue up behind it
+        self.worker.write(self.load_data, on_done=self.on_data_loaded, on_error=self.on_load_failed)
 
-    def create_csv_files(self):
-        # Create or reset purchase CSV
-        purchase_columns = ["Date", "Item", "Company", "Model", "Dealer", "City", "Price Per Unit", "Units Purchased"]
-        try:
-            if not os.path.exists(self.PURCHASE_FILE) or os.path.getsize(self.PURCHASE_FILE) == 0:
-                df = pd.DataFrame(columns=purchase_columns)
-                df.to_csv(self.PURCHASE_FILE, index=False)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create purchase_data.csv: {str(e)}")
-            return
+    def mark_window_ready(self):
+        self.startup_times["window_ms"] = (time.perf_counter() - STARTUP_T0) * 1000
 
-        # Create or reset sale CSV
-        sale_columns = ["Date", "Sale Dealer", "Item Sold", "Company", "Model", "Units Sold", "Sale Price Per Unit", "Total Bill", "Profit"]
+    def load_data(self):
+        # Runs on the writer thread. Returns warnings to show once the window is up.
+        # `loaded` is set here rather than in the Tk callbacks, so jobs waiting
+        # on it are released even while the Tk thread is blocked in on_close.
+        warnings = []
         try:
-            if not os.path.exists(self.SALE_FILE) or os.path.getsize(self.SALE_FILE) == 0:
-                df = pd.DataFrame(columns=sale_columns)
-                df.to_csv(self.SALE_FILE, index=False)
+            with metrics.timer("app.load_data"):
+                self.init_storage()
+                steps = [
+                    (self.core.load_model_history, "Error loading model history: {}. Starting with empty history."),
+                    (self.core.rebuild_cost_index, "Error indexing purchase prices: {}"),
+                    (self.core.rebuild_inventory, "Error building stock levels: {}"),
+                    (self.core.load_monthly_sales, "Error building monthly sales totals: {}"),
+                ]
+                for step, message in steps:
+                    try:
+                        step()
+                    except Exception as e:
+                        warnings.append(message.format(str(e)))
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to create sale_data.csv: {str(e)}")
-            return
+            self.load_error = e
+            raise
+        finally:
+            self.loaded.set()
+        return warnings
 
-        # Create or reset model history CSV
-        model_columns = ["Item", "Company", "Model"]
-        try:
-            if not os.path.exists(self.MODEL_HISTORY_FILE) or os.path.getsize(self.MODEL_HISTORY_FILE) == 0:
-                df = pd.DataFrame(columns=model_columns)
-                df.to_csv(self.MODEL_HISTORY_FILE, index=False)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create model_history.csv: {str(e)}")
+    def init_storage(self):
+        # Open the selected backend; CSV ledgers are created and repaired, a new
+        # SQLite database imports the existing CSVs once. With a server URL the
+        # app is a client of service.py and keeps no files of its own.
+        if self.server_url:
+            from service import ServiceClient
+            self.core = ServiceClient(self.server_url)
             return
-
-    def load_model_history(self):
+        from storage import make_backend
+        from core import TradersCore
         try:
-            if os.path.exists(self.MODEL_HISTORY_FILE) and os.path.getsize(self.MODEL_HISTORY_FILE) > 0:
-                df = pd.read_csv(self.MODEL_HISTORY_FILE)
-                return df.groupby('Item')['Model'].apply(list).to_dict()
-            return {}
+            storage = make_backend(self.storage_kind, db_path=self.DB_FILE,
+                                   purchase_file=self.PURCHASE_FILE,
+                                   sale_file=self.SALE_FILE,
+                                   model_file=self.MODEL_HISTORY_FILE)
+            storage.ensure()
         except Exception as e:
-            messagebox.showwarning("Warning", f"Error loading model history: {str(e)}. Starting with empty history.")
-            return {}
+            raise RuntimeError(f"Failed to open {self.storage_kind} storage: {str(e)}")
+        self.core = TradersCore(storage, self.MONTHLY_SALES_FILE, costing=self.costing,
+                                archive_dir=self.ARCHIVE_DIR)
 
-    def save_model_history(self, item, company, model):
-        if item and company and model:
-            try:
-                df = pd.read_csv(self.MODEL_HISTORY_FILE)
-                new_row = {"Item": item, "Company": company, "Model": model}
-                df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                df.to_csv(self.MODEL_HISTORY_FILE, index=False)
-                if item not in self.model_history:
-                    self.model_history[item] = []
-                if model not in self.model_history[item]:
-                    self.model_history[item].append(model)
-                    self.entry_model['values'] = self.model_history.get(self.combo_item.get(), [])
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save model history: {str(e)}")
+    def on_data_loaded(self, warnings):
+        self.startup_times["data_ms"] = (time.perf_counter() - STARTUP_T0) * 1000
+        self.close_splash()
+        self.refresh_model_dropdowns()
+        self.idle_text = self.startup_summary()
+        self.status_label.configure(text=self.idle_text)
+        for warning in warnings:
+            messagebox.showwarning("Warning", warning)
+
+    def on_load_failed(self, e):
+        self.close_splash()
+        self.idle_text = "Data could not be loaded"
+        messagebox.showerror("Error", str(e))
+
+    def startup_summary(self):
+        window_ms = self.startup_times.get("window_ms", 0)
+        data_ms = self.startup_times.get("data_ms", 0)
+        flag = "" if window_ms <= STARTUP_TARGET_MS else f" (over {STARTUP_TARGET_MS} ms target)"
+        return f"Ready - window {window_ms:.0f} ms{flag}, data {data_ms:.0f} ms"
+
+    def after_load(self, func):
+        # Wraps worker jobs so ones submitted during startup wait for the data
+        def run(*args, **kwargs):
+            self.loaded.wait()
+            if self.load_error is not None:
+                raise RuntimeError(f"Data is not available: {self.load_error}")
+            return func(*args, **kwargs)
+        return run
+
+    def read(self, func, **callbacks):
+        return self.worker.read(self.after_load(func), **callbacks)
+
+    def write(self, func, **callbacks):
+        return self.worker.write(self.after_load(func), **callbacks)
+
+    def catalog(self):
+        return self.core.catalog if self.loaded.is_set() and self.core is not None else None
+
+    def refresh_model_dropdowns(self):
+        self.update_company_dropdown()
+        self.update_model_dropdown()
+        self.update_sale_company_dropdown()
+        self.update_sale_model_dropdown()
+
+    def show_error(self, message):
+        def handler(e):
+            if isinstance(e, ValidationError):
+                show = messagebox.showwarning if e.title == "Input Error" else messagebox.showerror
+                show(e.title, e.message)
+            else:
+                messagebox.showerror("Error", f"{message}: {str(e)}")
+        return handler
+
+    def set_busy(self, busy):
+        if busy == self.busy:
+            return
+        self.busy = busy
+        if busy:
+            self.status_label.configure(text="Working...")
+            self.progress.start(10)
+            self.root.configure(cursor="watch")
+        else:
+            self.status_label.configure(text=self.idle_text)
+            self.progress.stop()
+            self.root.configure(cursor="")
+
+    def on_close(self):
+        # Let queued writes finish before the files are closed
+        self.worker.shutdown(wait=True)
+        if self.core is not None:
+            self.core.close()
+        self.root.destroy()
 
     def setup_main_window(self):
         self.root.title("AAA Traders")
@@ -105,10 +200,19 @@ class AAA_TradersApp:
         style.configure("TLabel", 
                        foreground="black", 
                        font=("Arial", 14))
+        self.busy = False
+        self.idle_text = "Loading data..."
+        status_bar = ttk.Frame(self.root)
+        status_bar.pack(side=tk.BOTTOM, fill='x')
+        self.status_label = ttk.Label(status_bar, text="Ready", font=("Arial", 10))
+        self.status_label.pack(side=tk.LEFT, padx=10)
+        self.progress = ttk.Progressbar(status_bar, mode='indeterminate', length=150)
+        self.progress.pack(side=tk.RIGHT, padx=10, pady=2)
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(pady=10, expand=True, fill='both')
 
     def show_splash(self):
+        # Stays up only until load_data finishes; the main window is already usable
         splash = tk.Toplevel(self.root)
         splash.overrideredirect(True)
         splash.title("AAA Traders - Loading...")
@@ -116,7 +220,13 @@ class AAA_TradersApp:
         self.center_window(splash, 400, 200)
         label = tk.Label(splash, text="Welcome to AAA Traders", font=("Arial", 18), bg="#2E7D32", fg="white")
         label.pack(expand=True, fill=tk.BOTH)
-        splash.after(5000, lambda: [splash.destroy(), self.root.deiconify()])
+        tk.Label(splash, text="Loading data...", font=("Arial", 11), bg="#2E7D32", fg="white").pack(fill=tk.X, ipady=8)
+        self.splash = splash
+
+    def close_splash(self):
+        if self.splash is not None:
+            self.splash.destroy()
+            self.splash = None
 
     def center_window(self, window, width=800, height=600):
         screen_width = window.winfo_screenwidth()
@@ -141,15 +251,18 @@ class AAA_TradersApp:
         tk.Label(purchase_tab, text="Item", background="#F0F0F0").grid(row=0, column=0, padx=10, pady=5, sticky='e')
         self.combo_item = ttk.Combobox(purchase_tab, values=self.ELECTRONICS_ITEMS + ["Add New..."], width=38)
         self.combo_item.grid(row=0, column=1, padx=10, pady=5)
-        self.combo_item.bind('<<ComboboxSelected>>', self.update_model_dropdown)
+        self.combo_item.bind('<<ComboboxSelected>>', lambda event: self.refresh_model_dropdowns())
         
         tk.Label(purchase_tab, text="Company", background="#F0F0F0").grid(row=1, column=0, padx=10, pady=5, sticky='e')
-        self.entry_company = ttk.Entry(purchase_tab, width=40)
+        self.entry_company = ttk.Combobox(purchase_tab, width=38)
         self.entry_company.grid(row=1, column=1, padx=10, pady=5)
+        self.entry_company.bind('<KeyRelease>', self.update_company_dropdown)
+        self.entry_company.bind('<<ComboboxSelected>>', self.update_model_dropdown)
         
         tk.Label(purchase_tab, text="Model Number", background="#F0F0F0").grid(row=2, column=0, padx=10, pady=5, sticky='e')
         self.entry_model = ttk.Combobox(purchase_tab, width=38)
         self.entry_model.grid(row=2, column=1, padx=10, pady=5)
+        self.entry_model.bind('<KeyRelease>', self.update_model_dropdown)
         
         tk.Label(purchase_tab, text="Dealer", background="#F0F0F0").grid(row=3, column=0, padx=10, pady=5, sticky='e')
         self.entry_dealer = ttk.Entry(purchase_tab, width=40)
@@ -170,6 +283,9 @@ class AAA_TradersApp:
         ttk.Button(purchase_tab, text="Save Purchase", command=self.save_purchase_data).grid(
             row=7, column=0, columnspan=2, pady=10
         )
+        ttk.Button(purchase_tab, text="Bulk Import Purchases...", command=lambda: self.bulk_import("purchase")).grid(
+            row=8, column=0, columnspan=2, pady=10
+        )
 
     def create_sale_tab(self):
         sale_tab = ttk.Frame(self.notebook)
@@ -186,15 +302,18 @@ class AAA_TradersApp:
         tk.Label(sale_tab, text="Item Sold", background="#F0F0F0").grid(row=1, column=0, padx=10, pady=5, sticky='e')
         self.combo_item_sold = ttk.Combobox(sale_tab, values=self.ELECTRONICS_ITEMS + ["Add New..."], width=38)
         self.combo_item_sold.grid(row=1, column=1, padx=10, pady=5)
-        self.combo_item_sold.bind('<<ComboboxSelected>>', self.update_sale_model_dropdown)
+        self.combo_item_sold.bind('<<ComboboxSelected>>', lambda event: self.refresh_model_dropdowns())
         
         tk.Label(sale_tab, text="Company", background="#F0F0F0").grid(row=2, column=0, padx=10, pady=5, sticky='e')
-        self.entry_company_sold = ttk.Entry(sale_tab, width=40)
+        self.entry_company_sold = ttk.Combobox(sale_tab, width=38)
         self.entry_company_sold.grid(row=2, column=1, padx=10, pady=5)
+        self.entry_company_sold.bind('<KeyRelease>', self.update_sale_company_dropdown)
+        self.entry_company_sold.bind('<<ComboboxSelected>>', self.update_sale_model_dropdown)
         
         tk.Label(sale_tab, text="Model Number", background="#F0F0F0").grid(row=3, column=0, padx=10, pady=5, sticky='e')
         self.entry_model_sold = ttk.Combobox(sale_tab, width=38)
         self.entry_model_sold.grid(row=3, column=1, padx=10, pady=5)
+        self.entry_model_sold.bind('<KeyRelease>', self.update_sale_model_dropdown)
         
         tk.Label(sale_tab, text="Units Sold", background="#F0F0F0").grid(row=4, column=0, padx=10, pady=5, sticky='e')
         self.entry_quantity = ttk.Entry(sale_tab, width=40)
@@ -207,118 +326,108 @@ class AAA_TradersApp:
         ttk.Button(sale_tab, text="Save Sale", command=self.save_sale_data).grid(
             row=6, column=0, columnspan=2, pady=10
         )
+        ttk.Button(sale_tab, text="Bulk Import Sales...", command=lambda: self.bulk_import("sale")).grid(
+            row=7, column=0, columnspan=2, pady=10
+        )
 
     def create_view_tab(self):
         view_tab = ttk.Frame(self.notebook)
         self.notebook.add(view_tab, text="View Records")
         ttk.Button(view_tab, text="View All Data", command=self.view_data).pack(pady=10)
         ttk.Button(view_tab, text="View Monthly Sales", command=self.view_monthly_sales).pack(pady=10)
+        ttk.Button(view_tab, text="View Stock Levels", command=self.view_stock_levels).pack(pady=10)
+        ttk.Button(view_tab, text="Analytics", command=self.view_analytics).pack(pady=10)
+        ttk.Button(view_tab, text="Diagnostics", command=self.view_diagnostics).pack(pady=10)
         ttk.Button(view_tab, text="Delete Selected Record", command=self.delete_selected_record).pack(pady=10)
+        ttk.Button(view_tab, text="Archive Old Records...", command=self.archive_old_records).pack(pady=10)
         ttk.Button(view_tab, text="Delete All Data", command=self.delete_all_data).pack(pady=10)
 
+    # Typeahead: each keystroke narrows the dropdown to catalog entries that
+    # start with the typed text (and, for models, the company typed so far)
+    def update_company_dropdown(self, event=None):
+        catalog = self.catalog()
+        self.entry_company['values'] = catalog.suggest_companies(
+            self.combo_item.get(), self.entry_company.get()) if catalog else []
+
     def update_model_dropdown(self, event=None):
-        item = self.combo_item.get()
-        self.entry_model['values'] = self.model_history.get(item, [])
+        catalog = self.catalog()
+        self.entry_model['values'] = catalog.suggest_models(
+            self.combo_item.get(), self.entry_model.get(), self.entry_company.get()) if catalog else []
+
+    def update_sale_company_dropdown(self, event=None):
+        catalog = self.catalog()
+        self.entry_company_sold['values'] = catalog.suggest_companies(
+            self.combo_item_sold.get(), self.entry_company_sold.get()) if catalog else []
 
     def update_sale_model_dropdown(self, event=None):
-        item = self.combo_item_sold.get()
-        self.entry_model_sold['values'] = self.model_history.get(item, [])
+        catalog = self.catalog()
+        self.entry_model_sold['values'] = catalog.suggest_models(
+            self.combo_item_sold.get(), self.entry_model_sold.get(), self.entry_company_sold.get()) if catalog else []
 
     def save_purchase_data(self):
-        item = self.combo_item.get().strip()
-        company = self.entry_company.get().strip()
-        model = self.entry_model.get().strip()
-        dealer = self.entry_dealer.get().strip()
-        city = self.combo_city.get().strip()
-        price = self.entry_price.get().strip()
-        units = self.entry_units.get().strip()
-        date = datetime.now().strftime("%Y-%m-%d")
-        
-        if not (item and company and model and dealer and city and price and units):
-            messagebox.showwarning("Input Error", "All fields are required!")
-            return
-        try:
-            price = float(price)
-            units = int(units)
-        except ValueError:
-            messagebox.showerror("Invalid Input", "Price must be a number and Units must be an integer.")
-            return
-            
-        self.save_model_history(item, company, model)
-        try:
-            df = pd.read_csv(self.PURCHASE_FILE)
-            new_row = {
-                "Date": date,
-                "Item": item,
-                "Company": company,
-                "Model": model,
-                "Dealer": dealer,
-                "City": city,
-                "Price Per Unit": price,
-                "Units Purchased": units
-            }
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            df.to_csv(self.PURCHASE_FILE, index=False)
+        fields = {
+            "Item": self.combo_item.get(),
+            "Company": self.entry_company.get(),
+            "Model": self.entry_model.get(),
+            "Dealer": self.entry_dealer.get(),
+            "City": self.combo_city.get(),
+            "Price Per Unit": self.entry_price.get(),
+            "Units Purchased": self.entry_units.get()
+        }
+
+        def done(_):
+            self.refresh_model_dropdowns()
             messagebox.showinfo("Success", "Purchase data saved successfully!")
             self.clear_purchase_fields()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save purchase data: {str(e)}")
+
+        self.write(lambda: self.core.add_purchase(fields), on_done=done,
+                   on_error=self.show_error("Failed to save purchase data"))
 
     def save_sale_data(self):
-        sale_dealer = self.entry_sale_dealer.get().strip()
-        item_sold = self.combo_item_sold.get().strip().lower()
-        company_sold = self.entry_company_sold.get().strip().lower()
-        model_sold = self.entry_model_sold.get().strip().lower()
-        quantity_sold = self.entry_quantity.get().strip()
-        sale_price = self.entry_sale_price.get().strip()
-        date = datetime.now().strftime("%Y-%m-%d")
-        
-        if not (sale_dealer and item_sold and company_sold and model_sold and quantity_sold and sale_price):
-            messagebox.showwarning("Input Error", "All fields are required!")
-            return
-        try:
-            quantity_sold = int(quantity_sold)
-            sale_price = float(sale_price)
-        except ValueError:
-            messagebox.showerror("Invalid Input", "Quantity and Sale Price must be numbers.")
-            return
-            
-        try:
-            purchase_df = pd.read_csv(self.PURCHASE_FILE)
-            purchase_df["Item"] = purchase_df["Item"].astype(str).str.strip().str.lower()
-            purchase_df["Company"] = purchase_df["Company"].astype(str).str.strip().str.lower()
-            purchase_df["Model"] = purchase_df["Model"].astype(str).str.strip().str.lower()
-            purchase_row = purchase_df[
-                (purchase_df["Item"] == item_sold) &
-                (purchase_df["Company"] == company_sold) &
-                (purchase_df["Model"] == model_sold)
-            ]
-            if purchase_row.empty:
-                messagebox.showerror("Error",
-                                   f"No purchase record found for '{item_sold} - {company_sold} - {model_sold}'. "
-                                   "Please verify that a matching purchase exists.")
-                return
-            cost_price = purchase_row["Price Per Unit"].values[0]
-            total_bill = sale_price * quantity_sold
-            profit = (sale_price - cost_price) * quantity_sold
-            sale_df = pd.read_csv(self.SALE_FILE)
-            new_row = {
-                "Date": date,
-                "Sale Dealer": sale_dealer,
-                "Item Sold": item_sold.capitalize(),
-                "Company": company_sold.capitalize(),
-                "Model": model_sold.capitalize(),
-                "Units Sold": quantity_sold,
-                "Sale Price Per Unit": sale_price,
-                "Total Bill": total_bill,
-                "Profit": profit
-            }
-            sale_df = pd.concat([sale_df, pd.DataFrame([new_row])], ignore_index=True)
-            sale_df.to_csv(self.SALE_FILE, index=False)
+        fields = {
+            "Sale Dealer": self.entry_sale_dealer.get(),
+            "Item Sold": self.combo_item_sold.get(),
+            "Company": self.entry_company_sold.get(),
+            "Model": self.entry_model_sold.get(),
+            "Units Sold": self.entry_quantity.get(),
+            "Sale Price Per Unit": self.entry_sale_price.get()
+        }
+
+        def done(_):
             messagebox.showinfo("Success", "Sale data saved successfully!")
             self.clear_sale_fields()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save sale data: {str(e)}")
+
+        self.write(lambda: self.core.add_sale(fields), on_done=done,
+                   on_error=self.show_error("Failed to save sale data"))
+
+    def bulk_import(self, kind):
+        path = filedialog.askopenfilename(
+            title=f"Import {kind} batch",
+            filetypes=[("CSV or Excel", "*.csv *.xlsx *.xls"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        errors_path = os.path.splitext(path)[0] + "_errors.csv"
+
+        def run():
+            from bulk_import import read_batch
+            rows, report = self.core.import_batch(kind, read_batch(path))
+            if not report.empty:
+                report.to_csv(errors_path, index=False)
+            return rows, report
+
+        def done(result):
+            rows, report = result
+            if kind == "purchase":
+                self.refresh_model_dropdowns()
+            message = f"Imported {len(rows)} {kind} record(s)."
+            if not report.empty:
+                message += f"\n{len(report)} row(s) were skipped; see {errors_path}"
+                messagebox.showwarning("Import Finished", message)
+            else:
+                messagebox.showinfo("Success", message)
+
+        self.write(run, on_done=done, on_error=self.show_error(f"Failed to import {kind} batch"))
 
     def clear_purchase_fields(self):
         self.combo_item.set('')
@@ -337,107 +446,236 @@ class AAA_TradersApp:
         self.entry_quantity.delete(0, tk.END)
         self.entry_sale_price.delete(0, tk.END)
 
-    def view_data(self):
+    def open_tabs(self, title, tabs):
+        # Opens the window straight away with a "Loading..." placeholder per tab
         win = tk.Toplevel(self.root)
-        win.title("View Data")
+        win.title(title)
         notebook = ttk.Notebook(win)
         notebook.pack(fill='both', expand=True, padx=10, pady=10)
-        
-        try:
-            purchase_frame = ttk.Frame(notebook)
-            notebook.add(purchase_frame, text="Purchase Data")
-            purchase_df = pd.read_csv(self.PURCHASE_FILE)
-            self.display_table(purchase_frame, purchase_df, "purchase")
-            
-            sale_frame = ttk.Frame(notebook)
-            notebook.add(sale_frame, text="Sale & Profit Data")
-            sale_df = pd.read_csv(self.SALE_FILE)
-            self.display_table(sale_frame, sale_df, "sale")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load data: {str(e)}")
+        frames = []
+        for text in tabs:
+            frame = ttk.Frame(notebook)
+            notebook.add(frame, text=text)
+            placeholder = ttk.Label(frame, text="Loading...")
+            placeholder.pack(pady=20)
+            frames.append((frame, placeholder))
+        return win, frames
+
+    def fill_tabs(self, win, frames, tables, table_types, deletable=False):
+        if not win.winfo_exists():
+            return
+        for (frame, placeholder), df, table_type in zip(frames, tables, table_types):
+            placeholder.destroy()
+            self.display_table(frame, df, table_type, deletable=deletable)
+
+    def view_data(self):
+        win, frames = self.open_tabs("View Data", ["Purchase Data", "Sale & Profit Data"])
+        self.read(
+            lambda: (self.core.read("purchase"), self.core.read("sale")),
+            on_done=lambda tables: self.fill_tabs(win, frames, tables, ["purchase", "sale"]),
+            on_error=self.show_error("Failed to load data")
+        )
 
     def view_monthly_sales(self):
+        win, frames = self.open_tabs("Monthly Sales", ["Monthly Summary", "By Item & Dealer"])
+        # Built on the writer thread so the totals are never read mid-update
+        self.write(
+            lambda: self.core.monthly_report(),
+            on_done=lambda tables: self.fill_tabs(win, frames, tables, ["monthly", "monthly"]),
+            on_error=self.show_error("Failed to load monthly sales")
+        )
+
+    def view_stock_levels(self):
+        win, frames = self.open_tabs("Stock Levels", [f"Stock ({self.costing.upper()} cost)"])
+        # Built on the writer thread so stock is never read mid-sale
+        self.write(
+            lambda: (self.core.stock_levels(),),
+            on_done=lambda tables: self.fill_tabs(win, frames, tables, ["stock"]),
+            on_error=self.show_error("Failed to load stock levels")
+        )
+
+    def view_analytics(self):
         win = tk.Toplevel(self.root)
-        win.title("Monthly Sales")
-        notebook = ttk.Notebook(win)
-        notebook.pack(fill='both', expand=True, padx=10, pady=10)
-        
-        try:
-            sale_df = pd.read_csv(self.SALE_FILE)
-            sale_df['Date'] = pd.to_datetime(sale_df['Date'])
-            sale_df['YearMonth'] = sale_df['Date'].dt.to_period('M')
-            monthly_summary = sale_df.groupby('YearMonth').agg({
-                'Units Sold': 'sum',
-                'Total Bill': 'sum',
-                'Profit': 'sum'
-            }).reset_index()
-            
-            monthly_frame = ttk.Frame(notebook)
-            notebook.add(monthly_frame, text="Monthly Summary")
-            self.display_table(monthly_frame, monthly_summary, "monthly")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load monthly sales: {str(e)}")
+        win.title("Analytics")
+        controls = ttk.Frame(win)
+        controls.pack(fill='x', padx=10, pady=5)
+        table_var = tk.StringVar(value="Sales")
+        group_var = tk.StringVar(value="Model")
+        start_var = tk.StringVar()
+        end_var = tk.StringVar()
+        top_var = tk.StringVar(value="20")
+        ttk.Label(controls, text="Data").pack(side=tk.LEFT, padx=5)
+        ttk.Combobox(controls, textvariable=table_var, values=["Sales", "Purchases"], state="readonly",
+                     width=10).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Group by").pack(side=tk.LEFT, padx=5)
+        ttk.Combobox(controls, textvariable=group_var, values=ANALYTICS_GROUPS, state="readonly",
+                     width=10).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="From (YYYY-MM-DD)").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(controls, textvariable=start_var, width=11).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="To").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(controls, textvariable=end_var, width=11).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Top").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(controls, textvariable=top_var, width=5).pack(side=tk.LEFT, padx=5)
+        results = ttk.Frame(win)
+        results.pack(fill='both', expand=True, padx=10, pady=10)
 
-    def delete_selected_record(self):
+        def show(df):
+            if not win.winfo_exists():
+                return
+            for child in results.winfo_children():
+                child.destroy()
+            self.display_table(results, df, "analytics")
+
+        def run():
+            top = top_var.get().strip()
+            if top and not top.isdigit():
+                messagebox.showwarning("Invalid Input", "Top must be a whole number.")
+                return
+            args = ("sale" if table_var.get() == "Sales" else "purchase", group_var.get(),
+                    start_var.get().strip(), end_var.get().strip(), int(top) if top else None)
+            for child in results.winfo_children():
+                child.destroy()
+            ttk.Label(results, text="Loading...").pack(pady=20)
+            # Built on the writer thread, like the monthly report, so the
+            # cached rollups are never read mid-update
+            self.write(lambda: self.core.analytics_report(*args), on_done=show,
+                       on_error=self.show_error("Failed to build analytics"))
+
+        ttk.Button(controls, text="Run", command=run).pack(side=tk.LEFT, padx=5)
+        run()
+
+    def view_diagnostics(self):
         win = tk.Toplevel(self.root)
-        win.title("Delete Record")
-        notebook = ttk.Notebook(win)
-        notebook.pack(fill='both', expand=True, padx=10, pady=10)
-        
-        try:
-            purchase_frame = ttk.Frame(notebook)
-            notebook.add(purchase_frame, text="Delete Purchase")
-            purchase_df = pd.read_csv(self.PURCHASE_FILE)
-            self.display_table(purchase_frame, purchase_df, "purchase", deletable=True)
-            
-            sale_frame = ttk.Frame(notebook)
-            notebook.add(sale_frame, text="Delete Sale")
-            sale_df = pd.read_csv(self.SALE_FILE)
-            self.display_table(sale_frame, sale_df, "sale", deletable=True)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load data for deletion: {str(e)}")
+        win.title("Diagnostics")
+        controls = ttk.Frame(win)
+        controls.pack(fill='x', padx=10, pady=5)
+        enabled_var = tk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(controls, text="Record timings", variable=enabled_var,
+                        command=lambda: setattr(metrics, "enabled", enabled_var.get())).pack(side=tk.LEFT, padx=5)
+        results = ttk.Frame(win)
+        results.pack(fill='both', expand=True, padx=10, pady=10)
+
+        def show(df):
+            if not win.winfo_exists():
+                return
+            for child in results.winfo_children():
+                child.destroy()
+            if df.empty:
+                text = ("No operations recorded yet." if metrics.enabled else
+                        "Timings are off. Tick \"Record timings\" or start with --metrics (or AAA_METRICS=1).")
+                ttk.Label(results, text=text).pack(pady=20)
+            else:
+                self.display_table(results, df, "diagnostics")
+
+        def refresh():
+            self.read(metrics.frame, on_done=show, on_error=self.show_error("Failed to load diagnostics"))
+
+        def reset():
+            metrics.reset()
+            refresh()
+
+        def export():
+            path = filedialog.asksaveasfilename(
+                parent=win, title="Export Diagnostics", defaultextension=".json",
+                filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+            if not path:
+                return
+            try:
+                metrics.export(path)
+                messagebox.showinfo("Export Complete", f"Diagnostics written to {path}", parent=win)
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to export diagnostics: {str(e)}", parent=win)
+
+        ttk.Button(controls, text="Refresh", command=refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Reset", command=reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Export...", command=export).pack(side=tk.LEFT, padx=5)
+        refresh()
+
+    def delete_selected_record(self):
+        win, frames = self.open_tabs("Delete Record", ["Delete Purchase", "Delete Sale"])
+        self.read(
+            lambda: (self.core.read("purchase"), self.core.read("sale")),
+            on_done=lambda tables: self.fill_tabs(win, frames, tables, ["purchase", "sale"], deletable=True),
+            on_error=self.show_error("Failed to load data for deletion")
+        )
+
+    def archive_old_records(self):
+        before = simpledialog.askstring(
+            "Archive Old Records",
+            "Archive all purchases and sales dated before (YYYY-MM-DD, YYYY-MM or YYYY):",
+            parent=self.root)
+        if not before or not before.strip():
+            return
+        if not messagebox.askyesno(
+                "Confirm Archive",
+                f"Move every record dated before {before.strip()} into the archive?\n"
+                "Archived records stay in reports but can no longer be edited or deleted."):
+            return
+
+        def done(counts):
+            messagebox.showinfo("Archive Finished",
+                                f"Archived {counts['purchase']} purchase(s) and {counts['sale']} sale(s).")
+
+        self.write(lambda: self.core.archive_before(before.strip()), on_done=done,
+                   on_error=self.show_error("Failed to archive records"))
 
     def delete_all_data(self):
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete all purchase and sale data?"):
-            try:
-                pd.DataFrame(columns=["Date", "Item", "Company", "Model", "Dealer", "City", "Price Per Unit", "Units Purchased"]).to_csv(self.PURCHASE_FILE, index=False)
-                pd.DataFrame(columns=["Date", "Sale Dealer", "Item Sold", "Company", "Model", "Units Sold", "Sale Price Per Unit", "Total Bill", "Profit"]).to_csv(self.SALE_FILE, index=False)
-                messagebox.showinfo("Success", "All data deleted successfully!")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete all data: {str(e)}")
+            self.write(
+                lambda: self.core.clear_all(),
+                on_done=lambda _: messagebox.showinfo("Success", "All data deleted successfully!"),
+                on_error=self.show_error("Failed to delete all data")
+            )
 
     def display_table(self, frame, df, table_type, deletable=False):
-        tree = ttk.Treeview(frame, columns=list(df.columns), show='headings')
-        for col in df.columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=100)
-        for i, row in df.iterrows():
-            tree.insert("", tk.END, values=tuple(row), iid=str(i))
-        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        tree.pack(fill='both', expand=True)
+        from table_view import VirtualTable
+        with metrics.timer("ui.render_table") as t:
+            table = VirtualTable(frame, df, worker=self.worker)
+            t.rows = len(df)
         
         if deletable:
             def delete_record():
-                selected_items = tree.selection()
-                if not selected_items:
+                keys = table.selected_keys()
+                if not keys:
                     messagebox.showwarning("Selection Error", "Please select at least one record to delete!")
                     return
-                try:
-                    indices = [int(item) for item in selected_items]
-                    df_new = df.drop(indices).reset_index(drop=True)
-                    df_new.to_csv(self.PURCHASE_FILE if table_type == "purchase" else self.SALE_FILE, index=False)
-                    tree.delete(*tree.get_children())
-                    for i, row in df_new.iterrows():
-                        tree.insert("", tk.END, values=tuple(row), iid=str(i))
-                    messagebox.showinfo("Success", f"{len(indices)} record(s) deleted successfully!")
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to delete record(s): {str(e)}")
+                def done(deleted):
+                    if table.tree.winfo_exists():
+                        table.remove_rows(deleted.index)
+                    messagebox.showinfo("Success", f"{len(deleted)} record(s) deleted successfully!")
+
+                self.write(lambda: self.core.delete(table_type, keys), on_done=done,
+                           on_error=self.show_error("Failed to delete record(s)"))
                 
             ttk.Button(frame, text="Delete Selected", command=delete_record).pack(pady=10)
+        return table
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AAA Traders")
+    parser.add_argument("--storage", choices=["csv", "sqlite"], default=None,
+                        help="storage backend (default: $AAA_STORAGE or csv)")
+    parser.add_argument("--server", default=None,
+                        help="URL of a running service.py to use instead of local files (default: $AAA_SERVER)")
+    parser.add_argument("--costing", choices=["fifo", "average"], default=None,
+                        help="inventory costing method for profit (default: $AAA_COSTING or fifo)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record timings and counters for the Diagnostics window (default: $AAA_METRICS)")
+    parser.add_argument("--startup-check", action="store_true",
+                        help=f"print startup times once data is loaded, then exit; "
+                             f"exit code 1 if the window took over {STARTUP_TARGET_MS} ms")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enabled = True
     root = tk.Tk()
-    app = AAA_TradersApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = AAA_TradersApp(root, storage_kind=args.storage, server_url=args.server, costing=args.costing)
+    if args.startup_check:
+        def check_startup():
+            if not app.loaded.is_set() or app.busy:
+                root.after(50, check_startup)
+                return
+            print(app.startup_summary())
+            app.on_close()
+        root.after(50, check_startup)
+    root.mainloop()
+    if args.startup_check and app.startup_times.get("window_ms", 0) > STARTUP_TARGET_MS:
+        sys.exit(1)
\ No newline at end of file
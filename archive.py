@@ -0,0 +1,290 @@
+import argparse
+import gzip
+import itertools
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+import pandas as pd
+from storage import make_backend, write_atomic, fsync_dir, in_range, text_dtypes, TABLE_COLUMNS
+from inventory import InventoryEngine, COSTING_METHODS
+from cost_index import normalize_key
+from metrics import metrics
+
+ARCHIVED_TABLES = ("purchase", "sale")
+# Partition name length in characters of the date: "2024-01" or "2024"
+FREQS = {"M": 7, "Y": 4}
+
+
+def parse_cutoff(value):
+    # "2025-01" or "2025" mean the first day of that month or year
+    text = str(value).strip()
+    text += {4: "-01-01", 7: "-01"}.get(len(text), "")
+    day = pd.to_datetime(text, format="%Y-%m-%d", errors="coerce")
+    if pd.isna(day):
+        raise ValueError(f"Invalid date '{value}' (expected YYYY-MM-DD, YYYY-MM or YYYY)")
+    return day.strftime("%Y-%m-%d")
+
+
+def partition_range(period):
+    # First day of the partition and first day after it, as YYYY-MM-DD
+    freq = "M" if len(period) == FREQS["M"] else "Y"
+    span = pd.Period(period, freq=freq)
+    return span.start_time.strftime("%Y-%m-%d"), (span + 1).start_time.strftime("%Y-%m-%d")
+
+
+# Gzipped CSV part files, one per period, for the rows of one archive run.
+# Parts are written as .tmp and only renamed by commit().
+class PartitionWriter:
+    def __init__(self, directory, table, run_id, freq="M"):
+        if freq not in FREQS:
+            raise ValueError(f"Unknown partition period '{freq}' (expected 'M' or 'Y')")
+        self.directory = os.path.join(directory, table)
+        self.run_id = run_id
+        self.width = FREQS[freq]
+        self.files = {}
+        self.rows = 0
+
+    def path(self, period):
+        return os.path.join(self.directory, period, f"part-{self.run_id}.csv.gz")
+
+    def __call__(self, chunk):
+        periods = chunk["Date"].astype(str).str.strip().str[:self.width]
+        for period, rows in chunk.groupby(periods, sort=True):
+            handle = self.files.get(period)
+            if handle is None:
+                os.makedirs(os.path.dirname(self.path(period)), exist_ok=True)
+                handle = self.files[period] = gzip.open(self.path(period) + ".tmp", "wt",
+                                                        newline="", encoding="utf-8")
+                rows.to_csv(handle, index=False, lineterminator="\n")
+            else:
+                rows.to_csv(handle, index=False, header=False, lineterminator="\n")
+            self.rows += len(rows)
+
+    def commit(self):
+        paths = {}
+        for period, handle in self.files.items():
+            handle.close()
+            path = self.path(period)
+            with open(path + ".tmp", "rb+") as f:
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            fsync_dir(path)
+            paths[period] = path
+        self.files = {}
+        return paths
+
+    def abort(self):
+        for period, handle in self.files.items():
+            handle.close()
+            os.remove(self.path(period) + ".tmp")
+        self.files = {}
+
+
+# Closed periods of the purchase and sale ledgers, moved out of the live files
+# into archive/<table>/<period>/part-<run>.csv.gz. state.json holds the cutoff
+# (everything dated before it is archived), the committed runs, and the stock
+# layers and first prices carried forward, so the live ledgers can be replayed
+# without the archived history. Parts of runs not listed there are ignored.
+class LedgerArchive:
+    def __init__(self, directory="archive"):
+        self.directory = directory
+        self.state_path = os.path.join(directory, "state.json")
+        self.state = self.load_state()
+
+    def load_state(self):
+        state = {"cutoff": None, "runs": [], "pending": False, "opening": {}, "prices": []}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                state.update(json.load(f))
+        return state
+
+    def save_state(self):
+        os.makedirs(self.directory, exist_ok=True)
+        write_atomic(self.state_path, json.dumps(self.state))
+        fsync_dir(self.state_path)
+
+    @property
+    def cutoff(self):
+        return self.state["cutoff"]
+
+    @property
+    def pending(self):
+        return self.state["pending"]
+
+    def covers(self, start):
+        # True when a report starting at start (None: no start) needs archived rows
+        return self.cutoff is not None and (start is None or str(start)[:10] < self.cutoff)
+
+    def opening(self, method):
+        return self.state["opening"].get(method, [])
+
+    def opening_prices(self):
+        return pd.DataFrame(self.state["prices"], columns=["Item", "Company", "Model", "Price Per Unit"])
+
+    def parts(self, table, start=None, end=None):
+        # (period, path) of committed parts overlapping [start, end], oldest first
+        root = os.path.join(self.directory, table)
+        if self.cutoff is None or not os.path.isdir(root):
+            return []
+        runs = set(self.state["runs"])
+        parts = []
+        for period in sorted(os.listdir(root)):
+            first, after = partition_range(period)
+            if (start is not None and after <= str(start)[:10]) or (end is not None and first > str(end)[:10]):
+                continue
+            for name in sorted(os.listdir(os.path.join(root, period))):
+                if name.endswith(".csv.gz") and name[len("part-"):-len(".csv.gz")] in runs:
+                    parts.append((period, os.path.join(root, period, name)))
+        return parts
+
+    def frames(self, table, start=None, end=None, columns=None):
+        # Yields archived records one part at a time, indexed by ID like storage.read()
+        usecols = None if columns is None else ["ID", "Date"] + [col for col in columns if col not in ("ID", "Date")]
+        for _, path in self.parts(table, start, end):
+            with metrics.timer("archive.read." + table) as t:
+                df = pd.read_csv(path, usecols=usecols, dtype=text_dtypes(["ID"] + TABLE_COLUMNS[table]))
+                t.rows = len(df)
+                t.bytes_read = os.path.getsize(path) if metrics.enabled else 0
+            df = df[in_range(df["Date"], start, end)].set_index("ID")
+            df.index.name = None
+            yield df if columns is None else df[list(columns)]
+
+    def read(self, table, start=None, end=None, columns=None):
+        frames = list(self.frames(table, start, end, columns))
+        if not frames:
+            return pd.DataFrame(columns=list(columns or TABLE_COLUMNS[table]))
+        return pd.concat(frames)
+
+    def archive(self, storage, before, freq="M", chunksize=50000):
+        # Moves purchases and sales dated before `before` into the archive.
+        # Order matters for crash safety: parts are committed, then state.json
+        # (marked pending), then the live ledgers are cut; a crash after the
+        # state is saved is finished by finish_pending() on the next start.
+        cutoff = parse_cutoff(before)
+        if self.pending:
+            self.finish_pending(storage)
+        if cutoff > datetime.now().strftime("%Y-%m-%d"):
+            raise ValueError(f"Cannot archive records up to {cutoff}, which is in the future")
+        if self.cutoff is not None and cutoff <= self.cutoff:
+            raise ValueError(f"Records before {self.cutoff} are already archived")
+        run_id = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        writers, finishers = {}, {}
+        try:
+            for table in ARCHIVED_TABLES:
+                writers[table] = PartitionWriter(self.directory, table, run_id, freq)
+                finishers[table] = storage.archive_before(table, cutoff, writers[table], chunksize)
+            parts = {table: writer.commit() for table, writer in writers.items()}
+        except Exception:
+            for writer in writers.values():
+                writer.abort()
+            raise
+        opening, prices = self.carry_forward(parts)
+        self.state.update(cutoff=cutoff, runs=self.state["runs"] + [run_id], pending=True,
+                          opening=opening, prices=prices)
+        self.save_state()
+        for finish in finishers.values():
+            finish()
+        self.state["pending"] = False
+        self.save_state()
+        return {table: writer.rows for table, writer in writers.items()}
+
+    def finish_pending(self, storage):
+        # Completes a run interrupted after its state was saved: the rows are
+        # already archived, so they are only dropped from the live ledgers
+        for table in ARCHIVED_TABLES:
+            storage.archive_before(table, self.cutoff)()
+        self.state["pending"] = False
+        self.save_state()
+
+    def carry_forward(self, parts):
+        # Replays the newly archived rows, a period at a time, on top of the
+        # previous opening balances, for every costing method
+        engines = {}
+        for method in COSTING_METHODS:
+            engines[method] = InventoryEngine(method)
+            engines[method].load_layers(self.opening(method))
+        prices = {normalize_key(*row[:3]): row for row in self.state["prices"]}
+        for period in sorted(set(parts["purchase"]) | set(parts["sale"])):
+            purchases, sales = (pd.read_csv(parts[table][period], dtype=text_dtypes(["ID"] + TABLE_COLUMNS[table]))
+                                if period in parts[table]
+                                else pd.DataFrame(columns=["ID"] + TABLE_COLUMNS[table])
+                                for table in ARCHIVED_TABLES)
+            for engine in engines.values():
+                engine.replay(purchases, sales)
+            ordered = purchases.sort_values("Date", kind="stable")
+            for item, company, model, price in ordered[["Item", "Company", "Model", "Price Per Unit"]].itertuples(
+                    index=False, name=None):
+                prices.setdefault(normalize_key(item, company, model), [item, company, model, float(price)])
+        return {method: engine.dump_layers() for method, engine in engines.items()}, list(prices.values())
+
+    def clear(self):
+        self.state = {"cutoff": None, "runs": [], "pending": False, "opening": {}, "prices": []}
+        if os.path.exists(self.state_path):
+            self.save_state()
+        for table in ARCHIVED_TABLES:
+            shutil.rmtree(os.path.join(self.directory, table), ignore_errors=True)
+
+
+def export(storage, archive, table, path, start=None, end=None, chunksize=50000):
+    # Streams archived and live records in [start, end] to a CSV file (gzipped
+    # if path ends in .gz), one archive part or live chunk at a time
+    opener = gzip.open if path.endswith(".gz") else open
+    written = 0
+    with opener(path, "wt", newline="", encoding="utf-8") as f:
+        f.write(",".join(["ID"] + TABLE_COLUMNS[table]) + "\n")
+        frames = archive.frames(table, start, end) if archive.covers(start) else []
+        live = storage.read(table, start=start, end=end)
+        chunks = (live.iloc[i:i + chunksize] for i in range(0, len(live), chunksize))
+        for df in itertools.chain(frames, chunks):
+            df[TABLE_COLUMNS[table]].to_csv(f, header=False, lineterminator="\n")
+            written += len(df)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive closed periods of the purchase and sale ledgers")
+    parser.add_argument("--storage", choices=["csv", "sqlite"], default=os.environ.get("AAA_STORAGE", "csv"))
+    parser.add_argument("--archive-dir", default="archive")
+    parser.add_argument("--chunksize", type=int, default=50000, help="rows streamed per chunk")
+    commands = parser.add_subparsers(dest="command", required=True)
+    close = commands.add_parser("close", help="archive every purchase and sale dated before a date")
+    close.add_argument("before", help="YYYY-MM-DD, YYYY-MM or YYYY")
+    close.add_argument("--freq", choices=sorted(FREQS), default="M", help="one archive file per month or year")
+    dump = commands.add_parser("export", help="stream archived and live records to a CSV file")
+    dump.add_argument("table", choices=ARCHIVED_TABLES)
+    dump.add_argument("path", help="output file; .gz is compressed")
+    dump.add_argument("--start")
+    dump.add_argument("--end")
+    commands.add_parser("status", help="show the archive cutoff and partitions")
+    args = parser.parse_args(argv)
+
+    storage = make_backend(args.storage)
+    storage.ensure()
+    archive = LedgerArchive(args.archive_dir)
+    try:
+        if archive.pending:
+            archive.finish_pending(storage)
+        if args.command == "close":
+            counts = archive.archive(storage, args.before, args.freq, args.chunksize)
+            print(f"Archived {counts['purchase']} purchase(s) and {counts['sale']} sale(s) "
+                  f"dated before {archive.cutoff}.")
+        elif args.command == "export":
+            written = export(storage, archive, args.table, args.path, args.start, args.end, args.chunksize)
+            print(f"Exported {written} {args.table} record(s) to {args.path}")
+        else:
+            print(f"Archived before: {archive.cutoff or '-'}")
+            for table in ARCHIVED_TABLES:
+                periods = sorted({period for period, _ in archive.parts(table)})
+                print(f"{table}: {', '.join(periods) or 'no partitions'}")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from app import ELECTRONICS_ITEMS, CITIES
+from storage import make_backend
+from core import TradersCore
+
+COMPANIES = ["Samsung", "LG", "Sony", "Haier", "Dawlance", "Orient", "PEL", "Philips", "HP", "Dell"]
+DEALERS = [f"Dealer {i}" for i in range(1, 41)]
+MODELS_PER_COMPANY = 20
+RESULT_COLUMNS = ["backend", "rows", "operation", "runs", "median_ms", "p95_ms", "max_ms", "peak_mb"]
+
+
+def generate_ledgers(rows, seed=0, days=730, end_date="2025-12-31"):
+    # Synthetic purchase and sale ledgers with the same columns the app writes.
+    # Sales only use models that were purchased and never exceed the stock bought.
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end_date)
+    items = rng.choice(ELECTRONICS_ITEMS, rows)
+    companies = rng.choice(COMPANIES, rows)
+    models = np.char.add("M-", rng.integers(0, MODELS_PER_COMPANY, rows).astype(str))
+    dates = (end - pd.to_timedelta(rng.integers(0, days, rows), unit="D")).strftime("%Y-%m-%d")
+    price = rng.integers(20, 2000, rows) * 100.0
+    purchases = pd.DataFrame({
+        "Date": dates,
+        "Item": items,
+        "Company": companies,
+        "Model": models,
+        "Dealer": rng.choice(DEALERS, rows),
+        "City": rng.choice(CITIES, rows),
+        "Price Per Unit": price,
+        "Units Purchased": rng.integers(5, 50, rows),
+    }).sort_values("Date", kind="stable").reset_index(drop=True)
+
+    picks = rng.integers(0, rows, rows)
+    source = purchases.iloc[picks]
+    sold = np.minimum(rng.integers(1, 5, rows), source["Units Purchased"].to_numpy())
+    sale_price = np.round(source["Price Per Unit"].to_numpy() * rng.uniform(1.05, 1.4, rows), 0)
+    shift = pd.to_timedelta(rng.integers(0, 30, rows), unit="D")
+    sale_dates = np.minimum(pd.to_datetime(source["Date"]).to_numpy() + shift.to_numpy(), end.to_datetime64())
+    sales = pd.DataFrame({
+        "Date": pd.DatetimeIndex(sale_dates).strftime("%Y-%m-%d"),
+        "Sale Dealer": rng.choice(DEALERS, rows),
+        "Item Sold": source["Item"].str.lower().str.capitalize().to_numpy(),
+        "Company": source["Company"].str.lower().str.capitalize().to_numpy(),
+        "Model": source["Model"].str.lower().str.capitalize().to_numpy(),
+        "Units Sold": sold,
+        "Sale Price Per Unit": sale_price,
+        "Total Bill": sale_price * sold,
+        "Profit": (sale_price - source["Price Per Unit"].to_numpy()) * sold,
+    }).sort_values("Date", kind="stable").reset_index(drop=True)
+    models_df = purchases[["Item", "Company", "Model"]].drop_duplicates()
+    return purchases, sales, models_df
+
+
+def write_ledgers(directory, purchases, sales, models_df):
+    files = {
+        "purchase_file": os.path.join(directory, "purchase_data.csv"),
+        "sale_file": os.path.join(directory, "sale_data.csv"),
+        "model_file": os.path.join(directory, "model_history.csv"),
+    }
+    purchases.to_csv(files["purchase_file"], index=False)
+    sales.to_csv(files["sale_file"], index=False)
+    models_df.to_csv(files["model_file"], index=False)
+    return files
+
+
+def measure(func, runs=1, memory=True):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    peak_mb = float("nan")
+    if memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    times.sort()
+    p95 = times[min(len(times) - 1, int(round(0.95 * (len(times) - 1))))]
+    return [len(times), statistics.median(times), p95, times[-1], peak_mb]
+
+
+def make_table_renderer():
+    # display_table needs a Tk display; returns None when there is none
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        from table_view import VirtualTable
+        root = tk.Tk()
+        root.withdraw()
+    except Exception:
+        return None
+
+    def render(df):
+        frame = ttk.Frame(root)
+        VirtualTable(frame, df)
+        root.update_idletasks()
+        frame.destroy()
+    return render
+
+
+def benchmark_backend(kind, rows, args, renderer):
+    directory = tempfile.mkdtemp(prefix=f"aaa-bench-{kind}-")
+    results = []
+    try:
+        purchases, sales, models_df = generate_ledgers(rows, seed=args.seed, days=args.days)
+        files = write_ledgers(directory, purchases, sales, models_df)
+        del purchases, sales, models_df
+        storage = make_backend(kind, db_path=os.path.join(directory, "aaa_traders.db"), **files)
+        storage.ensure()
+        core = TradersCore(storage, os.path.join(directory, "monthly_sales.json"), costing=args.costing,
+                           archive_dir=os.path.join(directory, "archive"))
+
+        def record(operation, func, runs=1):
+            results.append([kind, rows, operation] + measure(func, runs, memory=not args.no_memory))
+            print(f"  {kind:6} {rows:>9} {operation:24} median {results[-1][4]:10.2f} ms")
+
+        record("startup_load", lambda: (core.load_model_history(), core.rebuild_cost_index(),
+                                        core.rebuild_inventory(), core.load_monthly_sales()))
+        purchase = {"Item": "Laptop", "Company": "Bench", "Model": "B-1", "Dealer": "Dealer 1",
+                    "City": CITIES[0], "Price Per Unit": 1000, "Units Purchased": 1000000}
+        sale = {"Sale Dealer": "Dealer 1", "Item Sold": "Laptop", "Company": "Bench", "Model": "B-1",
+                "Units Sold": 1, "Sale Price Per Unit": 1200}
+        record("save_purchase_data", lambda: core.add_purchase(purchase), runs=args.runs)
+        record("save_sale_data", lambda: core.add_sale(sale), runs=args.runs)
+        record("view_monthly_sales", core.monthly_report, runs=args.runs)
+        record("monthly_rebuild", lambda: core.monthly_sales.build(core.read("sale")))
+        record("analytics_build", lambda: (core.analytics.invalidate(), core.analytics_report("sale", "Model")))
+        record("analytics_report", lambda: (core.analytics.cache.clear(),
+                                            core.analytics_report("sale", "Dealer", "2025-01-01", "2025-06-30")),
+               runs=args.runs)
+        record("view_data_load", lambda: (core.read("purchase"), core.read("sale")))
+        if renderer is not None:
+            sale_df = core.read("sale")
+            record("display_table", lambda: renderer(sale_df), runs=args.runs)
+            del sale_df
+        record("delete_selected_record", lambda: core.delete("sale", list(core.read("sale", ["Date"]).index[:1])))
+        core.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    # Flags operations whose median got slower than threshold x the baseline
+    baseline = pd.read_csv(baseline_path).set_index(["backend", "rows", "operation"])["median_ms"]
+    regressions = []
+    for row in results.itertuples(index=False):
+        key = (row.backend, row.rows, row.operation)
+        if key in baseline.index and row.median_ms > baseline[key] * threshold:
+            regressions.append(f"{row.backend}/{row.rows}/{row.operation}: "
+                               f"{baseline[key]:.2f} ms -> {row.median_ms:.2f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AAA Traders data paths on synthetic ledgers")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="ledger sizes (rows in each of the purchase and sale files)")
+    parser.add_argument("--backends", nargs="+", choices=["csv", "sqlite"], default=["csv", "sqlite"])
+    parser.add_argument("--runs", type=int, default=5, help="repetitions for the per-record operations")
+    parser.add_argument("--days", type=int, default=730, help="spread of synthetic dates in days")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--costing", choices=["fifo", "average"], default="fifo")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    parser.add_argument("--no-gui", action="store_true", help="skip display_table even if a display is available")
+    parser.add_argument("--output", help="write results to this CSV file")
+    parser.add_argument("--compare", help="baseline CSV from an earlier --output run")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="with --compare, fail if a median is more than this factor slower")
+    parser.add_argument("--generate", metavar="DIR",
+                        help="only write synthetic ledgers of the first size into DIR and exit")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        os.makedirs(args.generate, exist_ok=True)
+        files = write_ledgers(args.generate, *generate_ledgers(args.sizes[0], seed=args.seed, days=args.days))
+        print("Wrote " + ", ".join(files.values()))
+        return 0
+
+    renderer = None if args.no_gui else make_table_renderer()
+    if renderer is None:
+        print("No display available: display_table is not measured.")
+    rows = []
+    for size in args.sizes:
+        for kind in args.backends:
+            rows.extend(benchmark_backend(kind, size, args, renderer))
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(results.round(2).to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print("REGRESSION " + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+import pandas as pd
+from storage import make_backend, PURCHASE_COLUMNS, SALE_COLUMNS
+from inventory import OversellError
+
+PURCHASE_INPUT = ["Item", "Company", "Model", "Dealer", "City", "Price Per Unit", "Units Purchased"]
+SALE_INPUT = ["Sale Dealer", "Item Sold", "Company", "Model", "Units Sold", "Sale Price Per Unit"]
+INTEGER_PATTERN = r"^[+-]?\d+$"
+
+
+def read_batch(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xls"):
+        # Needs openpyxl (xlsx) or xlrd (xls) installed alongside pandas
+        return pd.read_excel(path, dtype=str)
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def add_error(errors, mask, message):
+    errors[mask] = errors[mask] + message + "; "
+
+
+def prepare(batch, required, closed_before=None):
+    missing = [col for col in required if col not in batch.columns]
+    if missing:
+        raise ValueError(f"Batch is missing column(s): {', '.join(missing)}")
+    df = batch.copy()
+    for col in required:
+        df[col] = df[col].fillna("").astype(str).str.strip()
+    errors = pd.Series("", index=df.index, dtype=object)
+    add_error(errors, (df[required] == "").any(axis=1), "All fields are required")
+    if "Date" in df.columns:
+        dates = df["Date"].fillna("").astype(str).str.strip().str[:10]
+        today = datetime.now().strftime("%Y-%m-%d")
+        dates = dates.mask(dates == "", today)
+        add_error(errors, pd.to_datetime(dates, format="%Y-%m-%d", errors="coerce").isna(),
+                  "Date must be YYYY-MM-DD")
+        if closed_before is not None:
+            add_error(errors, dates < closed_before, f"Period closed: dates before {closed_before} are archived")
+        df["Date"] = dates
+    else:
+        df["Date"] = datetime.now().strftime("%Y-%m-%d")
+    return df, errors
+
+
+# Same rules as save_purchase_data, applied to the whole batch at once
+def validate_purchases(batch, closed_before=None):
+    df, errors = prepare(batch, PURCHASE_INPUT, closed_before)
+    price = pd.to_numeric(df["Price Per Unit"], errors="coerce").astype("float64")
+    units_ok = df["Units Purchased"].str.match(INTEGER_PATTERN)
+    add_error(errors, price.isna() | ~units_ok,
+              "Price must be a number and Units must be an integer.")
+    units = pd.to_numeric(df["Units Purchased"].where(units_ok), errors="coerce")
+    add_error(errors, units <= 0, "Units must be greater than zero.")
+    df["Price Per Unit"] = price
+    df["Units Purchased"] = units
+    valid = errors == ""
+    rows = df.loc[valid, PURCHASE_COLUMNS].copy()
+    rows["Units Purchased"] = rows["Units Purchased"].astype("int64")
+    return rows, errors[~valid]
+
+
+# Same rules as save_sale_data: lower-cased key checked against the purchase
+# cost index, Total Bill computed column-wise. Profit uses the cost index price,
+# or when an inventory engine is given, the cost of the stock layers consumed
+# row by row in file order (oversold rows are rejected).
+def validate_sales(batch, cost_index, inventory=None, closed_before=None):
+    df, errors = prepare(batch, SALE_INPUT, closed_before)
+    for col in ["Item Sold", "Company", "Model"]:
+        df[col] = df[col].str.lower()
+    price = pd.to_numeric(df["Sale Price Per Unit"], errors="coerce").astype("float64")
+    quantity_ok = df["Units Sold"].str.match(INTEGER_PATTERN)
+    add_error(errors, price.isna() | ~quantity_ok, "Quantity and Sale Price must be numbers.")
+    cost = cost_index.lookup_frame(df, ["Item Sold", "Company", "Model"])
+    add_error(errors, cost.isna() & (df[["Item Sold", "Company", "Model"]] != "").all(axis=1),
+              "No purchase record found for this item, company and model")
+    quantity = pd.to_numeric(df["Units Sold"].where(quantity_ok), errors="coerce")
+    add_error(errors, quantity <= 0, "Quantity must be greater than zero.")
+    df["Units Sold"] = quantity
+    df["Sale Price Per Unit"] = price
+    df["Total Bill"] = price * quantity
+    if inventory is None:
+        df["Profit"] = (price - cost) * quantity
+    else:
+        sold_cost = pd.Series(float("nan"), index=df.index)
+        for idx in df.index[errors == ""]:
+            try:
+                sold_cost[idx] = inventory.consume(df.at[idx, "Item Sold"], df.at[idx, "Company"],
+                                                   df.at[idx, "Model"], df.at[idx, "Units Sold"],
+                                                   date=df.at[idx, "Date"])
+            except OversellError as e:
+                errors[idx] += str(e) + "; "
+        df["Profit"] = df["Total Bill"] - sold_cost
+    for col in ["Item Sold", "Company", "Model"]:
+        df[col] = df[col].str.capitalize()
+    valid = errors == ""
+    rows = df.loc[valid, SALE_COLUMNS].copy()
+    rows["Units Sold"] = rows["Units Sold"].astype("int64")
+    return rows, errors[~valid]
+
+
+def error_report(errors):
+    # Row numbers match the spreadsheet: header is row 1
+    return pd.DataFrame({"Row": errors.index + 2, "Error": errors.str.rstrip("; ")})
+
+
+class BulkImporter:
+    def __init__(self, storage, cost_index, monthly_sales, inventory=None, catalog=None, archive=None):
+        self.storage = storage
+        self.cost_index = cost_index
+        self.monthly_sales = monthly_sales
+        self.inventory = inventory
+        self.catalog = catalog
+        self.archive = archive
+
+    # Validates the batch and commits every valid row in a single append.
+    # With strict=True nothing is written if any row fails.
+    def import_batch(self, kind, batch, strict=False):
+        inventory_state = self.inventory.snapshot() if self.inventory is not None else None
+        closed_before = self.archive.cutoff if self.archive is not None else None
+        if kind == "purchase":
+            rows, errors = validate_purchases(batch, closed_before)
+        elif kind == "sale":
+            rows, errors = validate_sales(batch, self.cost_index, self.inventory, closed_before)
+        else:
+            raise ValueError(f"Unknown batch kind '{kind}' (expected 'purchase' or 'sale')")
+        if strict and not errors.empty:
+            if inventory_state is not None:
+                self.inventory.restore(inventory_state)
+            return rows.iloc[0:0], error_report(errors)
+        records = rows.to_dict("records")
+        try:
+            self.storage.append_many(kind, records)
+        except Exception:
+            if inventory_state is not None:
+                self.inventory.restore(inventory_state)
+            raise
+        if records and "ID" in records[0]:
+            rows.index = [record["ID"] for record in records]
+        if kind == "purchase":
+            triples = rows[["Item", "Company", "Model"]].drop_duplicates().itertuples(index=False, name=None)
+            if self.catalog is None:
+                models = [{"Item": item, "Company": company, "Model": model} for item, company, model in triples]
+            else:
+                models = self.catalog.unseen(triples)
+            if models:
+                self.storage.append_many("model", models)
+            for record in records:
+                self.cost_index.add(record["Item"], record["Company"], record["Model"], record["Price Per Unit"])
+                if self.catalog is not None:
+                    self.catalog.add(record["Item"], record["Company"], record["Model"])
+                if self.inventory is not None:
+                    self.inventory.receive(record["Item"], record["Company"], record["Model"],
+                                           record["Units Purchased"], record["Price Per Unit"], record["Date"])
+        else:
+            self.monthly_sales.add_rows(rows)
+        return rows, error_report(errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import a purchase or sale batch (CSV or Excel)")
+    parser.add_argument("kind", choices=["purchase", "sale"])
+    parser.add_argument("path")
+    parser.add_argument("--storage", choices=["csv", "sqlite"], default=os.environ.get("AAA_STORAGE", "csv"))
+    parser.add_argument("--strict", action="store_true", help="import nothing if any row is invalid")
+    parser.add_argument("--costing", choices=["fifo", "average"], default=os.environ.get("AAA_COSTING", "fifo"))
+    parser.add_argument("--errors", help="where to write the per-row error report (default: <batch>_errors.csv)")
+    args = parser.parse_args(argv)
+
+    # Imported here: core itself builds on BulkImporter
+    from core import TradersCore
+
+    storage = make_backend(args.storage)
+    storage.ensure()
+    core = TradersCore(storage, costing=args.costing)
+    core.load_model_history()
+    core.rebuild_cost_index()
+    core.rebuild_inventory()
+    core.load_monthly_sales()
+    rows, report = core.importer.import_batch(args.kind, read_batch(args.path), strict=args.strict)
+    core.close()
+    print(f"Imported {len(rows)} {args.kind} row(s), {len(report)} error(s).")
+    if not report.empty:
+        errors_path = args.errors or os.path.splitext(args.path)[0] + "_errors.csv"
+        report.to_csv(errors_path, index=False)
+        print(f"Error report written to {errors_path}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
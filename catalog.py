@@ -0,0 +1,89 @@
+from bisect import bisect_left, insort
+
+
+def norm(value):
+    return str(value).strip().lower()
+
+
+# Deduplicated item -> company -> model catalog. Each item keeps its companies
+# and models in lists sorted by lower-cased name, so typeahead is a binary
+# search for the typed prefix plus a short scan; memory grows with distinct
+# (item, company, model) entries only, not with the number of purchases.
+class ModelCatalog:
+    def __init__(self, max_suggestions=50):
+        self.max_suggestions = max_suggestions
+        self.known = set()
+        self.item_names = {}
+        self.companies = {}
+        self.models = {}
+
+    def clear(self):
+        self.known = set()
+        self.item_names = {}
+        self.companies = {}
+        self.models = {}
+
+    def add(self, item, company, model):
+        # Returns True only for an entry not seen before (case-insensitive)
+        item, company, model = str(item).strip(), str(company).strip(), str(model).strip()
+        key = (norm(item), norm(company), norm(model))
+        if not all(key) or key in self.known:
+            return False
+        self.known.add(key)
+        self.item_names.setdefault(key[0], item)
+        companies = self.companies.setdefault(key[0], [])
+        position = bisect_left(companies, (key[1],))
+        if position == len(companies) or companies[position][0] != key[1]:
+            companies.insert(position, (key[1], company))
+        insort(self.models.setdefault(key[0], []), (key[2], model, key[1], company))
+        return True
+
+    def unseen(self, entries):
+        # Model ledger rows for the (item, company, model) entries not known yet
+        seen, rows = set(), []
+        for item, company, model in entries:
+            key = (norm(item), norm(company), norm(model))
+            if all(key) and key not in self.known and key not in seen:
+                seen.add(key)
+                rows.append({"Item": str(item).strip(), "Company": str(company).strip(), "Model": str(model).strip()})
+        return rows
+
+    def build(self, model_df):
+        self.clear()
+        for item, company, model in model_df[["Item", "Company", "Model"]].itertuples(index=False, name=None):
+            self.add(item, company, model)
+
+    def scan(self, entries, prefix):
+        prefix = norm(prefix)
+        position = bisect_left(entries, (prefix,))
+        while position < len(entries) and entries[position][0].startswith(prefix):
+            yield entries[position]
+            position += 1
+
+    def suggest_models(self, item, prefix="", company=""):
+        company_key = norm(company)
+        results = []
+        for _, model, model_company, _ in self.scan(self.models.get(norm(item), []), prefix):
+            if company_key and not model_company.startswith(company_key):
+                continue
+            if not results or results[-1] != model:
+                results.append(model)
+            if len(results) >= self.max_suggestions:
+                break
+        return results
+
+    def suggest_companies(self, item, prefix=""):
+        results = []
+        for _, company in self.scan(self.companies.get(norm(item), []), prefix):
+            results.append(company)
+            if len(results) >= self.max_suggestions:
+                break
+        return results
+
+    def entries(self):
+        return [[self.item_names[item_key], company, model]
+                for item_key, models in self.models.items()
+                for _, model, _, company in models]
+
+    def __len__(self):
+        return len(self.known)
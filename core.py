@@ -0,0 +1,317 @@
+from datetime import datetime
+import pandas as pd
+from cost_index import CostIndex, normalize_key
+from storage import KEY_COLUMNS
+from aggregates import SalesAggregates
+from bulk_import import BulkImporter
+from inventory import InventoryEngine, OversellError
+from errors import ValidationError
+from catalog import ModelCatalog, norm
+from analytics import Analytics
+from archive import LedgerArchive
+from metrics import metrics
+
+PRICE_COLUMNS = ["Item", "Company", "Model", "Price Per Unit"]
+
+
+def field(fields, name):
+    value = fields.get(name)
+    return "" if value is None else str(value).strip()
+
+
+# Validation, cost lookup, profit calculation and persistence shared by the
+# Tk app, the bulk importer CLI and the HTTP service. Not thread-safe for
+# writes: callers funnel writes through a single thread or task.
+class TradersCore:
+    def __init__(self, storage, monthly_sales_file="monthly_sales.json", costing="fifo", archive_dir="archive"):
+        self.storage = storage
+        self.cost_index = CostIndex()
+        self.inventory = InventoryEngine(costing)
+        self.monthly_sales = SalesAggregates(monthly_sales_file, freq="M", source=storage.name,
+                                             marker=lambda: storage.marker("sale"))
+        self.catalog = ModelCatalog()
+        self.archive = LedgerArchive(archive_dir)
+        if self.archive.pending:
+            self.archive.finish_pending(storage)
+        self.analytics = Analytics(storage, self.archive)
+        self.importer = BulkImporter(storage, self.cost_index, self.monthly_sales, self.inventory, self.catalog,
+                                     self.archive)
+
+    def rebuild_cost_index(self):
+        try:
+            with metrics.timer("load.cost_index") as t:
+                self.cost_index.build(self.with_opening_prices(self.storage.read("purchase", PRICE_COLUMNS)))
+                t.rows = len(self.cost_index)
+        except Exception:
+            self.cost_index.clear()
+            raise
+
+    def rebuild_inventory(self):
+        try:
+            with metrics.timer("load.inventory") as t:
+                purchase_df, sale_df = self.storage.read("purchase"), self.storage.read("sale")
+                self.inventory.build(purchase_df, sale_df, self.archive.opening(self.inventory.method))
+                t.rows = len(purchase_df) + len(sale_df)
+        except Exception:
+            self.inventory.clear()
+            raise
+
+    def with_opening_prices(self, purchase_df):
+        # First prices of archived models come first, as if their purchases were still live
+        if self.archive.cutoff is None:
+            return purchase_df
+        return pd.concat([self.archive.opening_prices(), purchase_df[PRICE_COLUMNS]], ignore_index=True)
+
+    def load_monthly_sales(self):
+        # The aggregate file is rebuilt from the sale ledger, and any archived
+        # sales, when missing, unreadable or saved against another ledger state
+        # (a crash between the sale and the aggregate save, or an outside edit)
+        with metrics.timer("load.monthly_sales") as t:
+            if not self.monthly_sales.load():
+                self.monthly_sales.build(self.storage.read("sale"))
+                for df in self.archive.frames("sale"):
+                    self.monthly_sales.add_rows(df)
+            t.rows = len(self.monthly_sales.totals)
+
+    def load_model_history(self):
+        # Older ledgers logged the model on every purchase; the redundant rows
+        # are dropped once here, after which only new entries are appended
+        with metrics.timer("load.model_catalog") as t:
+            df = self.storage.read("model")
+            self.catalog.build(df)
+            t.rows = len(df)
+        if len(df) > len(self.catalog):
+            keys = df[["Item", "Company", "Model"]].fillna("").apply(lambda col: col.map(norm))
+            redundant = keys.duplicated() | (keys == "").any(axis=1)
+            self.storage.delete("model", list(df.index[redundant]))
+        return self.catalog
+
+    def purchase_row(self, fields):
+        item = field(fields, "Item")
+        company = field(fields, "Company")
+        model = field(fields, "Model")
+        dealer = field(fields, "Dealer")
+        city = field(fields, "City")
+        price = field(fields, "Price Per Unit")
+        units = field(fields, "Units Purchased")
+        if not (item and company and model and dealer and city and price and units):
+            raise ValidationError("Input Error", "All fields are required!")
+        try:
+            price = float(price)
+            units = int(units)
+        except ValueError:
+            raise ValidationError("Invalid Input", "Price must be a number and Units must be an integer.")
+        if units <= 0:
+            raise ValidationError("Invalid Input", "Units must be greater than zero.")
+        return {
+            "Date": self.entry_date(fields),
+            "Item": item,
+            "Company": company,
+            "Model": model,
+            "Dealer": dealer,
+            "City": city,
+            "Price Per Unit": price,
+            "Units Purchased": units
+        }
+
+    def entry_date(self, fields):
+        date = field(fields, "Date") or datetime.now().strftime("%Y-%m-%d")
+        if self.archive.cutoff is not None and date < self.archive.cutoff:
+            raise ValidationError("Period Closed",
+                                  f"Records dated before {self.archive.cutoff} are archived and can no longer change.")
+        return date
+
+    def sale_row(self, fields):
+        sale_dealer = field(fields, "Sale Dealer")
+        item_sold = field(fields, "Item Sold").lower()
+        company_sold = field(fields, "Company").lower()
+        model_sold = field(fields, "Model").lower()
+        quantity_sold = field(fields, "Units Sold")
+        sale_price = field(fields, "Sale Price Per Unit")
+        if not (sale_dealer and item_sold and company_sold and model_sold and quantity_sold and sale_price):
+            raise ValidationError("Input Error", "All fields are required!")
+        try:
+            quantity_sold = int(quantity_sold)
+            sale_price = float(sale_price)
+        except ValueError:
+            raise ValidationError("Invalid Input", "Quantity and Sale Price must be numbers.")
+        if quantity_sold <= 0:
+            raise ValidationError("Invalid Input", "Quantity must be greater than zero.")
+        date = self.entry_date(fields)
+        with metrics.timer("lookup.cost_index"):
+            cost = self.cost_index.lookup(item_sold, company_sold, model_sold)
+        if cost is None:
+            raise ValidationError("Error",
+                                  f"No purchase record found for '{item_sold} - {company_sold} - {model_sold}'. "
+                                  "Please verify that a matching purchase exists.")
+        # Consumes stock right away so later sales in the same batch see it;
+        # commit_sales rebuilds the inventory if the write then fails
+        try:
+            with metrics.timer("lookup.inventory"):
+                cost = self.inventory.consume(item_sold, company_sold, model_sold, quantity_sold, date=date)
+        except OversellError as e:
+            raise ValidationError("Insufficient Stock", str(e))
+        total_bill = sale_price * quantity_sold
+        return {
+            "Date": date,
+            "Sale Dealer": sale_dealer,
+            "Item Sold": item_sold.capitalize(),
+            "Company": company_sold.capitalize(),
+            "Model": model_sold.capitalize(),
+            "Units Sold": quantity_sold,
+            "Sale Price Per Unit": sale_price,
+            "Total Bill": total_bill,
+            "Profit": float(total_bill - cost)
+        }
+
+    def commit_purchases(self, rows):
+        if not rows:
+            return
+        models = self.catalog.unseen((row["Item"], row["Company"], row["Model"]) for row in rows)
+        if models:
+            self.storage.append_many("model", models)
+        self.storage.append_many("purchase", rows)
+        for row in rows:
+            self.cost_index.add(row["Item"], row["Company"], row["Model"], row["Price Per Unit"])
+            self.inventory.receive(row["Item"], row["Company"], row["Model"],
+                                   row["Units Purchased"], row["Price Per Unit"], row["Date"])
+            self.catalog.add(row["Item"], row["Company"], row["Model"])
+        self.rebuild_out_of_order("purchase", pd.DataFrame(rows))
+        self.analytics.add_rows("purchase", rows)
+
+    def commit_sales(self, rows):
+        if not rows:
+            return
+        try:
+            self.storage.append_many("sale", rows)
+        except Exception:
+            self.rebuild_inventory()
+            raise
+        if len(rows) == 1:
+            self.monthly_sales.add_sale(rows[0])
+        else:
+            self.monthly_sales.add_rows(pd.DataFrame(rows))
+        self.rebuild_out_of_order("sale", pd.DataFrame(rows))
+        self.analytics.add_rows("sale", rows)
+
+    def add_purchase(self, fields):
+        with metrics.timer("save.purchase") as t:
+            row = self.purchase_row(fields)
+            self.commit_purchases([row])
+            t.rows = 1
+        return row
+
+    def add_sale(self, fields):
+        with metrics.timer("save.sale") as t:
+            row = self.sale_row(fields)
+            self.commit_sales([row])
+            t.rows = 1
+        return row
+
+    def import_batch(self, kind, batch, strict=False):
+        with metrics.timer("import." + kind) as t:
+            rows, report = self.importer.import_batch(kind, batch, strict=strict)
+            self.rebuild_out_of_order(kind, rows)
+            self.analytics.add_rows(kind, rows)
+            t.rows = len(rows)
+        return rows, report
+
+    def read(self, table, columns=None):
+        return self.storage.read(table, columns)
+
+    def delete(self, table, keys):
+        # Keys are record IDs from read(); returns the records actually deleted.
+        # Only the deleted records are read, and only their models' stock and
+        # prices are re-derived, from those models' own history.
+        with metrics.timer("delete." + table) as t:
+            deleted = self.storage.fetch(table, keys)
+            self.storage.delete(table, list(deleted.index))
+            self.analytics.remove_rows(table, deleted)
+            if table == "sale":
+                self.monthly_sales.remove_rows(deleted)
+            self.rebuild_keys(table, deleted)
+            t.rows = len(deleted)
+        return deleted
+
+    def rebuild_keys(self, table, records):
+        item, company, model = KEY_COLUMNS[table]
+        keys = {normalize_key(*key) for key in records[[item, company, model]].itertuples(index=False, name=None)}
+        if not keys:
+            return
+        purchase_df = self.storage.read("purchase", keys=keys)
+        self.inventory.rebuild_keys(keys, purchase_df, self.storage.read("sale", keys=keys),
+                                    self.archive.opening(self.inventory.method))
+        if table == "purchase":
+            self.cost_index.rebuild_keys(keys, self.with_opening_prices(purchase_df))
+
+    def rebuild_out_of_order(self, table, rows):
+        # Stock is defined by date order. Rows dated before entries already
+        # applied to their model (a backdated purchase or sale, or a purchase
+        # on the day of an earlier sale) were applied last, so those models
+        # are replayed from their history instead.
+        if rows.empty:
+            return
+        item, company, model = KEY_COLUMNS[table]
+        order = 0 if table == "purchase" else 1
+        stale = [self.inventory.out_of_order(*key, order)
+                 for key in rows[[item, company, model, "Date"]].itertuples(index=False, name=None)]
+        if any(stale):
+            self.rebuild_keys(table, rows[stale])
+
+    def clear_all(self):
+        self.storage.clear("purchase")
+        self.storage.clear("sale")
+        self.monthly_sales.clear()
+        self.cost_index.clear()
+        self.inventory.clear()
+        self.archive.clear()
+        self.analytics.invalidate()
+
+    def archive_before(self, before, freq="M"):
+        # Period close: moves records dated before `before` out of the live
+        # ledgers. Stock and prices carry over, so rebuilding gives the same state.
+        try:
+            with metrics.timer("archive.close") as t:
+                counts = self.archive.archive(self.storage, before, freq)
+                t.rows = sum(counts.values())
+        except ValueError as e:
+            raise ValidationError("Invalid Input", str(e))
+        self.analytics.invalidate()
+        self.rebuild_cost_index()
+        self.rebuild_inventory()
+        # Totals are unchanged, but the live sale ledger they are checked against is not
+        self.monthly_sales.save()
+        return counts
+
+    def read_history(self, table, start=None, end=None):
+        # Purchases or sales dated in [start, end], reading archived partitions
+        # only when the range starts before the archive cutoff
+        df = self.storage.read(table, start=start, end=end)
+        if not self.archive.covers(start):
+            return df
+        return pd.concat(list(self.archive.frames(table, start, end)) + [df])
+
+    def stock_levels(self):
+        with metrics.timer("report.stock") as t:
+            df = self.inventory.stock_levels()
+            t.rows = len(df)
+        return df
+
+    def monthly_report(self):
+        with metrics.timer("report.monthly") as t:
+            summary, detail = self.monthly_sales.summary(), self.monthly_sales.detail()
+            t.rows = len(detail)
+        return summary, detail
+
+    def analytics_report(self, table, group, start=None, end=None, top=None):
+        try:
+            with metrics.timer(f"report.analytics.{table}") as t:
+                df = self.analytics.report(table, group, start, end, top)
+                t.rows = len(df)
+            return df
+        except ValueError as e:
+            raise ValidationError("Invalid Input", str(e))
+
+    def close(self):
+        self.monthly_sales.close()
+        self.storage.close()
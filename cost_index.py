@@ -0,0 +1,58 @@
+import pandas as pd
+
+KEY_COLUMNS = ["Item", "Company", "Model"]
+
+
+def normalize_key(item, company, model):
+    return tuple(str(value).strip().lower() for value in (item, company, model))
+
+
+def first_prices(purchase_df):
+    if purchase_df.empty:
+        return {}
+    keys = purchase_df[KEY_COLUMNS].astype(str).apply(lambda col: col.str.strip().str.lower())
+    keys["Price Per Unit"] = purchase_df["Price Per Unit"]
+    first = keys.drop_duplicates(subset=KEY_COLUMNS, keep="first")
+    return {
+        (item, company, model): price
+        for item, company, model, price in first.itertuples(index=False, name=None)
+    }
+
+
+# In-memory (item, company, model) -> cost price map. Keeps the first purchase
+# price seen for a key, matching the original first-matching-row lookup.
+class CostIndex:
+    def __init__(self):
+        self.prices = {}
+
+    def build(self, purchase_df):
+        # Swap in the finished dict so lookups from other threads never see a partial index
+        self.prices = first_prices(purchase_df)
+
+    def rebuild_keys(self, keys, purchase_df):
+        # Re-derives only these keys from purchase_df, which must hold all of their purchases
+        prices = dict(self.prices)
+        for key in keys:
+            prices.pop(key, None)
+        for key, price in first_prices(purchase_df).items():
+            if key in keys:
+                prices[key] = price
+        self.prices = prices
+
+    def add(self, item, company, model, price):
+        self.prices.setdefault(normalize_key(item, company, model), price)
+
+    def lookup(self, item, company, model):
+        return self.prices.get(normalize_key(item, company, model))
+
+    def lookup_frame(self, df, columns=KEY_COLUMNS):
+        # Column-wise lookup for a batch; unknown keys come back as NaN
+        keys = df[list(columns)].astype(str).apply(lambda col: col.str.strip().str.lower())
+        prices = [self.prices.get(key) for key in keys.itertuples(index=False, name=None)]
+        return pd.Series(prices, index=df.index, dtype="float64")
+
+    def clear(self):
+        self.prices = {}
+
+    def __len__(self):
+        return len(self.prices)
@@ -0,0 +1,6 @@
+# Raised for bad input; title/message are what the entry forms show
+class ValidationError(ValueError):
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+        self.message = message
@@ -0,0 +1,169 @@
+from collections import deque
+import pandas as pd
+from cost_index import normalize_key
+
+COSTING_METHODS = ("fifo", "average")
+
+
+class OversellError(ValueError):
+    def __init__(self, key, requested, on_hand):
+        super().__init__(f"Only {on_hand} unit(s) of '{' - '.join(key)}' in stock; cannot sell {requested}.")
+        self.key = key
+        self.requested = requested
+        self.on_hand = on_hand
+
+
+# Stock on hand and cost layers per normalized (item, company, model).
+# FIFO keeps one [units, unit cost] layer per purchase and consumes the oldest
+# first; "average" keeps a single layer at the weighted-average cost. A sale
+# only touches the layers it consumes, so it never rescans purchase history.
+# Stock is defined by replaying in date order, purchases before sales on the
+# same day; latest keeps the last (date, order) applied per key so callers can
+# tell when an entry landed before others and the key must be re-derived.
+class InventoryEngine:
+    def __init__(self, method="fifo"):
+        if method not in COSTING_METHODS:
+            raise ValueError(f"Unknown costing method '{method}' (expected 'fifo' or 'average')")
+        self.method = method
+        self.layers = {}
+        self.on_hand = {}
+        self.display = {}
+        self.latest = {}
+
+    def clear(self):
+        self.layers = {}
+        self.on_hand = {}
+        self.display = {}
+        self.latest = {}
+
+    def note(self, key, date, order):
+        event = (str(date)[:10], order)
+        self.latest[key] = max(self.latest.get(key, event), event)
+
+    def out_of_order(self, item, company, model, date, order):
+        # True when an entry (order 0: purchase, 1: sale) on date sorts before
+        # one already applied to the key, so replay would apply it earlier
+        return (str(date)[:10], order) < self.latest.get(normalize_key(item, company, model), ("", 0))
+
+    def receive(self, item, company, model, units, unit_cost, date=None):
+        key = normalize_key(item, company, model)
+        self.display.setdefault(key, (str(item).strip(), str(company).strip(), str(model).strip()))
+        if date is not None:
+            self.note(key, date, 0)
+        units = int(units)
+        if units <= 0:
+            return
+        layers = self.layers.setdefault(key, deque())
+        if self.method == "average" and layers:
+            held, cost = layers[0]
+            total = held + units
+            layers[0] = [total, (held * cost + units * float(unit_cost)) / total]
+        else:
+            layers.append([units, float(unit_cost)])
+        self.on_hand[key] = self.on_hand.get(key, 0) + units
+
+    def consume(self, item, company, model, units, allow_oversell=False, date=None):
+        # Returns the total cost of the units sold. Units sold beyond stock
+        # (only when replaying old ledgers) are costed at the last known price.
+        # Non-positive quantities are refused, or skipped when replaying.
+        key = normalize_key(item, company, model)
+        units = int(units)
+        if units <= 0:
+            if allow_oversell:
+                return 0.0
+            raise ValueError(f"Cannot sell {units} unit(s) of '{' - '.join(key)}'; quantity must be positive.")
+        on_hand = self.on_hand.get(key, 0)
+        if units > on_hand and not allow_oversell:
+            raise OversellError(key, units, on_hand)
+        if date is not None:
+            self.note(key, date, 1)
+        layers = self.layers.get(key, deque())
+        remaining = units
+        total_cost = 0.0
+        last_cost = layers[-1][1] if layers else 0.0
+        while remaining > 0 and layers:
+            layer = layers[0]
+            take = min(remaining, layer[0])
+            total_cost += take * layer[1]
+            last_cost = layer[1]
+            layer[0] -= take
+            remaining -= take
+            if layer[0] == 0 and (self.method == "fifo" or remaining > 0):
+                layers.popleft()
+        total_cost += remaining * last_cost
+        self.on_hand[key] = max(0, on_hand - units)
+        return total_cost
+
+    def build(self, purchase_df, sale_df, opening=None):
+        # opening: layers carried forward from archived records (see dump_layers)
+        self.clear()
+        if opening:
+            self.load_layers(opening)
+        self.replay(purchase_df, sale_df)
+
+    def rebuild_keys(self, keys, purchase_df, sale_df, opening=None):
+        # Re-derives only these keys; the frames must hold all of their records
+        keys = set(keys)
+        for key in keys:
+            self.layers.pop(key, None)
+            self.on_hand.pop(key, None)
+            self.display.pop(key, None)
+            self.latest.pop(key, None)
+        if opening:
+            self.load_layers([entry for entry in opening if normalize_key(*entry[:3]) in keys])
+        self.replay(purchase_df, sale_df)
+
+    def replay(self, purchase_df, sale_df):
+        # Applies both ledgers in date order, purchases before sales on the same day
+        purchases = pd.DataFrame({
+            "Date": purchase_df["Date"].astype(str), "Order": 0,
+            "Item": purchase_df["Item"], "Company": purchase_df["Company"], "Model": purchase_df["Model"],
+            "Units": purchase_df["Units Purchased"], "Cost": purchase_df["Price Per Unit"],
+        })
+        sales = pd.DataFrame({
+            "Date": sale_df["Date"].astype(str), "Order": 1,
+            "Item": sale_df["Item Sold"], "Company": sale_df["Company"], "Model": sale_df["Model"],
+            "Units": sale_df["Units Sold"], "Cost": 0.0,
+        })
+        events = pd.concat([purchases, sales], ignore_index=True)
+        events = events.dropna(subset=["Units"]).sort_values(["Date", "Order"], kind="stable")
+        last = {}
+        for date, order, item, company, model, units, cost in events.itertuples(index=False, name=None):
+            if order == 0:
+                self.receive(item, company, model, units, cost)
+            else:
+                self.consume(item, company, model, units, allow_oversell=True)
+            last[item, company, model] = (date, order)
+        # Events are in order, so each model's last one is its latest
+        for (item, company, model), (date, order) in last.items():
+            self.note(normalize_key(item, company, model), date, order)
+
+    def dump_layers(self):
+        return [list(self.display.get(key, key)) + [[list(layer) for layer in layers]]
+                for key, layers in self.layers.items()]
+
+    def load_layers(self, data):
+        for item, company, model, layers in data:
+            key = normalize_key(item, company, model)
+            self.display.setdefault(key, (item, company, model))
+            self.layers[key] = deque([int(units), float(cost)] for units, cost in layers)
+            self.on_hand[key] = sum(int(units) for units, _ in layers)
+
+    def snapshot(self):
+        return ({key: deque(list(layer) for layer in layers) for key, layers in self.layers.items()},
+                dict(self.on_hand), dict(self.display), dict(self.latest))
+
+    def restore(self, state):
+        self.layers, self.on_hand, self.display, self.latest = state
+
+    def stock(self, item, company, model):
+        return self.on_hand.get(normalize_key(item, company, model), 0)
+
+    def stock_levels(self):
+        rows = []
+        for key, units in self.on_hand.items():
+            value = sum((held * cost for held, cost in self.layers.get(key, ())), 0.0)
+            item, company, model = self.display.get(key, key)
+            rows.append([item, company, model, units, round(value / units, 2) if units else 0.0, round(value, 2)])
+        df = pd.DataFrame(rows, columns=["Item", "Company", "Model", "On Hand", "Avg Unit Cost", "Stock Value"])
+        return df.sort_values(["Item", "Company", "Model"]).reset_index(drop=True)
@@ -0,0 +1,145 @@
+import bisect
+import csv
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open-ended
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+COLUMNS = ["Operation", "Calls", "Rows", "Bytes Read", "Bytes Written",
+           "Total ms", "Mean ms", "p50 ms", "p95 ms", "Max ms", "Histogram"]
+
+
+def bucket_label(bound):
+    return "inf" if bound == float("inf") else f"{bound:g}"
+
+
+class Stat:
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the given fraction of calls
+        target = fraction * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= target and count:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.name, (time.perf_counter() - self.start) * 1000,
+                            self.rows, self.bytes_read, self.bytes_written)
+        return False
+
+
+class NullTimer:
+    # Shared no-op stand-in while instrumentation is off; attribute writes are ignored
+    rows = bytes_read = bytes_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+# Latency histograms and row/byte counters per named data operation. While
+# disabled, timer() is a flag check returning a shared no-op, so the
+# instrumented code paths cost next to nothing.
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stats = {}
+        self.started = datetime.now()
+        self.lock = threading.Lock()
+
+    def timer(self, name):
+        # with metrics.timer("storage.read.sale") as t: ...; t.rows = len(df)
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name)
+
+    def record(self, name, elapsed_ms, rows=0, bytes_read=0, bytes_written=0):
+        with self.lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = Stat()
+            stat.calls += 1
+            stat.rows += rows
+            stat.bytes_read += bytes_read
+            stat.bytes_written += bytes_written
+            stat.total_ms += elapsed_ms
+            stat.max_ms = max(stat.max_ms, elapsed_ms)
+            stat.buckets[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.started = datetime.now()
+
+    def rows(self):
+        # One summary row per operation, in COLUMNS order
+        with self.lock:
+            stats = sorted(self.stats.items())
+            return [[name, stat.calls, stat.rows, stat.bytes_read, stat.bytes_written,
+                     round(stat.total_ms, 2), round(stat.total_ms / stat.calls, 2),
+                     round(stat.percentile(0.5), 2), round(stat.percentile(0.95), 2), round(stat.max_ms, 2),
+                     " ".join(f"<={bucket_label(bound)}:{count}"
+                              for bound, count in zip(BUCKETS_MS, stat.buckets) if count)]
+                    for name, stat in stats]
+
+    def frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.rows(), columns=COLUMNS)
+
+    def export(self, path):
+        # .json keeps the full histograms; anything else is written as CSV
+        rows = self.rows()
+        if os.path.splitext(path)[1].lower() == ".json":
+            with self.lock:
+                buckets = {name: {bucket_label(bound): count for bound, count in zip(BUCKETS_MS, stat.buckets)}
+                           for name, stat in self.stats.items()}
+            data = {
+                "since": self.started.isoformat(timespec="seconds"),
+                "exported": datetime.now().isoformat(timespec="seconds"),
+                "operations": [dict(zip(COLUMNS[:-1], row[:-1]), Buckets=buckets.get(row[0], {})) for row in rows],
+            }
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        else:
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(COLUMNS)
+                writer.writerows(rows)
+
+
+metrics = Metrics(enabled=os.environ.get("AAA_METRICS", "") not in ("", "0"))
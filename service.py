@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import json
+import os
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlsplit
+import pandas as pd
+from storage import make_backend
+from core import TradersCore, ValidationError
+from catalog import ModelCatalog
+from metrics import metrics
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+MAX_BODY = 64 * 1024 * 1024
+TABLES = ("purchase", "sale")
+
+
+def frame_to_json(df):
+    return json.loads(df.to_json(orient="split", date_format="iso"))
+
+
+def frame_from_json(data):
+    return pd.DataFrame(data["data"], index=data["index"], columns=data["columns"])
+
+
+def json_default(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# Local HTTP/JSON front end for TradersCore. Any number of clients can connect;
+# every write goes through one queue and one writer task, which validates and
+# commits runs of consecutive purchases or sales as a single append.
+class TradersService:
+    def __init__(self, core, host="127.0.0.1", port=8765, max_batch=500):
+        self.core = core
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.queue = None
+        self.writer_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aaa-service-write")
+        self.readers = ThreadPoolExecutor(max_workers=4, thread_name_prefix="aaa-service-read")
+
+    async def serve(self):
+        self.queue = asyncio.Queue()
+        writer_task = asyncio.create_task(self.writer_loop())
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        print(f"AAA Traders service listening on http://{self.host}:{self.port} ({self.core.storage.name} storage)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer_task.cancel()
+            self.writer_thread.shutdown(wait=True)
+            self.readers.shutdown(wait=True)
+
+    async def submit(self, kind, payload):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((kind, payload, future))
+        return await future
+
+    async def writer_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            results = await loop.run_in_executor(self.writer_thread, self.apply_batch, batch)
+            for (_, _, future), (result, error) in zip(batch, results):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def apply_batch(self, batch):
+        # Runs on the writer thread. Consecutive purchases (or sales) are
+        # committed together; anything else is a callable run in order.
+        results = [(None, None)] * len(batch)
+        i = 0
+        while i < len(batch):
+            kind, payload, _ = batch[i]
+            if kind not in ("purchase", "sale"):
+                try:
+                    results[i] = (payload(), None)
+                except Exception as e:
+                    results[i] = (None, e)
+                i += 1
+                continue
+            make_row = self.core.purchase_row if kind == "purchase" else self.core.sale_row
+            commit = self.core.commit_purchases if kind == "purchase" else self.core.commit_sales
+            rows, positions = [], []
+            while i < len(batch) and batch[i][0] == kind:
+                try:
+                    rows.append(make_row(batch[i][1]))
+                    positions.append(i)
+                except Exception as e:
+                    results[i] = (None, e)
+                i += 1
+            try:
+                commit(rows)
+                for position, row in zip(positions, rows):
+                    results[position] = (row, None)
+            except Exception as e:
+                for position in positions:
+                    results[position] = (None, e)
+        return results
+
+    async def read(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, func, *args)
+
+    async def dispatch(self, method, target, body):
+        path = urlsplit(target).path.rstrip("/") or "/"
+        parts = path.strip("/").split("/")
+        data = json.loads(body) if body else {}
+        if method == "GET":
+            if path == "/health":
+                return 200, {"status": "ok", "storage": self.core.storage.name}
+            if path == "/metrics":
+                return 200, {"enabled": metrics.enabled, "metrics": frame_to_json(metrics.frame())}
+            if path == "/models":
+                # The writer thread adds to the catalog, so read it there too
+                return 200, {"models": await self.submit("call", self.core.catalog.entries)}
+            if len(parts) == 2 and parts[0] == "records" and parts[1] in TABLES:
+                query = {name: values[-1] for name, values in parse_qs(urlsplit(target).query).items()}
+                if query.get("start") or query.get("end"):
+                    records = await self.read(self.core.read_history, parts[1],
+                                              query.get("start") or None, query.get("end") or None)
+                else:
+                    records = await self.read(self.core.read, parts[1])
+                return 200, {"records": frame_to_json(records)}
+            if path == "/stock":
+                return 200, {"stock": frame_to_json(await self.submit("call", self.core.stock_levels))}
+            if path == "/reports/monthly":
+                summary, detail = await self.submit("call", self.core.monthly_report)
+                return 200, {"summary": frame_to_json(summary), "detail": frame_to_json(detail)}
+            if path == "/reports/analytics":
+                query = {name: values[-1] for name, values in parse_qs(urlsplit(target).query).items()}
+                report = await self.submit("call", lambda: self.core.analytics_report(
+                    query.get("table", "sale"), query.get("group", "Item"), query.get("start"), query.get("end"),
+                    int(query["top"]) if query.get("top") else None))
+                return 200, {"report": frame_to_json(report)}
+        elif method == "POST":
+            if path == "/purchases":
+                return 201, {"record": await self.submit("purchase", data)}
+            if path == "/sales":
+                return 201, {"record": await self.submit("sale", data)}
+            if len(parts) == 2 and parts[0] == "import" and parts[1] in TABLES:
+                batch = pd.DataFrame(data.get("rows", [])).fillna("").astype(str)
+                rows, report = await self.submit(
+                    "call", lambda: self.core.import_batch(parts[1], batch, strict=bool(data.get("strict"))))
+                return 200, {"rows": frame_to_json(rows), "errors": frame_to_json(report)}
+            if len(parts) == 2 and parts[0] == "delete" and parts[1] in TABLES:
+                keys = data.get("keys", [])
+                deleted = await self.submit("call", lambda: self.core.delete(parts[1], keys))
+                return 200, {"deleted": frame_to_json(deleted)}
+            if path == "/clear":
+                await self.submit("call", self.core.clear_all)
+                return 200, {"status": "cleared"}
+            if path == "/archive":
+                counts = await self.submit("call", lambda: self.core.archive_before(
+                    data.get("before", ""), data.get("freq", "M")))
+                return 200, {"archived": counts, "cutoff": self.core.archive.cutoff}
+        else:
+            raise HttpError(405, f"Method {method} not allowed")
+        raise HttpError(404, f"No route for {method} {path}")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                try:
+                    if length > MAX_BODY:
+                        raise HttpError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.dispatch(method, target, body)
+                except ValidationError as e:
+                    status, payload = 400, {"error": {"title": e.title, "message": e.message}}
+                except HttpError as e:
+                    status, payload = e.status, {"error": {"title": "Error", "message": e.message}}
+                except (ValueError, KeyError) as e:
+                    status, payload = 400, {"error": {"title": "Error", "message": str(e)}}
+                except Exception as e:
+                    status, payload = 500, {"error": {"title": "Error", "message": str(e)}}
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                data = json.dumps(payload, default=json_default).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive or status == 413:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+# Drop-in replacement for TradersCore that talks to a running service, so the
+# Tk app can be one of several clients sharing the same ledgers.
+class ServiceClient:
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.catalog = ModelCatalog()
+
+    def request(self, method, path, payload=None):
+        data = None if payload is None else json.dumps(payload, default=json_default).encode("utf-8")
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                error = json.loads(e.read())["error"]
+            except Exception:
+                raise e
+            if e.code == 400:
+                raise ValidationError(error["title"], error["message"])
+            raise RuntimeError(error["message"])
+
+    def load_model_history(self):
+        self.catalog.clear()
+        for item, company, model in self.request("GET", "/models")["models"]:
+            self.catalog.add(item, company, model)
+        return self.catalog
+
+    def rebuild_cost_index(self):
+        pass
+
+    def rebuild_inventory(self):
+        pass
+
+    def load_monthly_sales(self):
+        pass
+
+    def add_purchase(self, fields):
+        row = self.request("POST", "/purchases", fields)["record"]
+        self.catalog.add(row["Item"], row["Company"], row["Model"])
+        return row
+
+    def add_sale(self, fields):
+        return self.request("POST", "/sales", fields)["record"]
+
+    def import_batch(self, kind, batch, strict=False):
+        rows = batch.fillna("").astype(str).to_dict("records")
+        result = self.request("POST", f"/import/{kind}", {"rows": rows, "strict": strict})
+        imported = frame_from_json(result["rows"])
+        if kind == "purchase" and not imported.empty:
+            self.load_model_history()
+        return imported, frame_from_json(result["errors"])
+
+    def read(self, table, columns=None):
+        df = frame_from_json(self.request("GET", f"/records/{table}")["records"])
+        return df[list(columns)] if columns else df
+
+    def read_history(self, table, start=None, end=None):
+        query = urlencode({"start": start or "", "end": end or ""})
+        return frame_from_json(self.request("GET", f"/records/{table}?{query}")["records"])
+
+    def delete(self, table, keys):
+        keys = [key.item() if hasattr(key, "item") else key for key in keys]
+        return frame_from_json(self.request("POST", f"/delete/{table}", {"keys": keys})["deleted"])
+
+    def clear_all(self):
+        self.request("POST", "/clear", {})
+
+    def archive_before(self, before, freq="M"):
+        return self.request("POST", "/archive", {"before": before, "freq": freq})["archived"]
+
+    def stock_levels(self):
+        return frame_from_json(self.request("GET", "/stock")["stock"])
+
+    def monthly_report(self):
+        result = self.request("GET", "/reports/monthly")
+        return frame_from_json(result["summary"]), frame_from_json(result["detail"])
+
+    def analytics_report(self, table, group, start=None, end=None, top=None):
+        query = {"table": table, "group": group, "start": start or "", "end": end or "", "top": top or ""}
+        return frame_from_json(self.request("GET", "/reports/analytics?" + urlencode(query))["report"])
+
+    def close(self):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AAA Traders HTTP/JSON service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--storage", choices=["csv", "sqlite"], default=os.environ.get("AAA_STORAGE", "csv"))
+    parser.add_argument("--costing", choices=["fifo", "average"], default=os.environ.get("AAA_COSTING", "fifo"))
+    parser.add_argument("--metrics", action="store_true", help="record timings and counters, served at GET /metrics")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        metrics.enabled = True
+
+    storage = make_backend(args.storage)
+    storage.ensure()
+    core = TradersCore(storage, costing=args.costing)
+    core.load_model_history()
+    core.rebuild_cost_index()
+    core.rebuild_inventory()
+    core.load_monthly_sales()
+    try:
+        asyncio.run(TradersService(core, args.host, args.port).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        core.close()
+
+
+if __name__ == "__main__":
+    main()
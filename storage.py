@@ -0,0 +1,889 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+import pandas as pd
+from metrics import metrics
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+PURCHASE_COLUMNS = ["Date", "Item", "Company", "Model", "Dealer", "City", "Price Per Unit", "Units Purchased"]
+SALE_COLUMNS = ["Date", "Sale Dealer", "Item Sold", "Company", "Model", "Units Sold", "Sale Price Per Unit", "Total Bill", "Profit"]
+MODEL_COLUMNS = ["Item", "Company", "Model"]
+CATEGORY_COLUMNS = ["Item", "Company", "Dealer", "City", "Sale Dealer", "Item Sold"]
+# Columns holding the (item, company, model) key of each table
+KEY_COLUMNS = {"purchase": ["Item", "Company", "Model"], "sale": ["Item Sold", "Company", "Model"]}
+NUMERIC_COLUMNS = ["ID", "Price Per Unit", "Units Purchased", "Units Sold", "Sale Price Per Unit", "Total Bill", "Profit"]
+
+
+def fsync_dir(path):
+    # Make a rename durable; not supported on Windows, where os.replace is enough
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+
+def text_dtypes(columns):
+    # Text columns are read as strings, so a model like "0123" never becomes 123
+    return {col: str for col in columns if col not in NUMERIC_COLUMNS}
+
+
+def normalized_key(row, columns):
+    return tuple(str(row[col]).strip().lower() for col in columns)
+
+
+def key_ids(df, columns):
+    # Record IDs (the index) grouped by normalized (item, company, model)
+    if df.empty:
+        return {}
+    normalized = []
+    for col in columns:
+        # Only the distinct values are stripped and lower-cased
+        codes, uniques = pd.factorize(df[col].astype(str))
+        normalized.append(pd.Index(uniques).str.strip().str.lower().to_numpy()[codes])
+    ids = df.index.to_numpy()
+    return {key: ids[positions].tolist() for key, positions in df.groupby(normalized, sort=False).indices.items()}
+
+
+def in_range(dates, start=None, end=None):
+    # Mask of dates within [start, end]; None leaves that end open
+    dates = dates.astype(str).str[:10]
+    mask = pd.Series(True, index=dates.index)
+    if start is not None:
+        mask &= dates >= str(start)[:10]
+    if end is not None:
+        mask &= dates <= str(end)[:10]
+    return mask
+
+
+def categorize(df):
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+# Typed columnar copy of a CSV ledger: Feather when pyarrow is installed
+# (memory-mapped, reads only the requested columns), otherwise a pandas pickle.
+# It covers the ledger up to a byte offset; rows appended since are parsed
+# from the CSV tail and folded in once the tail grows past refresh_bytes.
+# The CSV stays the source of truth: a snapshot that no longer matches it is
+# rebuilt from scratch. While the CSV's size and mtime are the ones recorded
+# at save time, or after this process's own appends, it is trusted as is;
+# otherwise the covered bytes are hashed again and compared.
+class LedgerSnapshot:
+    # Bumped when the stored metadata or dtypes change, so older snapshots are rebuilt
+    FORMAT = 3
+
+    def __init__(self, csv_path, columns, refresh_bytes=1024 * 1024):
+        base = os.path.splitext(csv_path)[0]
+        self.csv_path = csv_path
+        self.columns = list(columns)
+        self.path = base + (".feather" if feather is not None else ".snapshot.pkl")
+        self.meta_path = base + ".snapshot.json"
+        self.refresh_bytes = refresh_bytes
+        self.bytes_read = 0
+        # (size, mtime_ns) of the CSV after this process last checked or appended to it
+        self.seen = None
+
+    def stat(self):
+        stat = os.stat(self.csv_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def fingerprint(self, offset):
+        # Hash of every byte the snapshot covers, to notice edits made outside the app
+        digest = hashlib.sha1()
+        with open(self.csv_path, "rb") as f:
+            while offset > 0:
+                block = f.read(min(offset, 1024 * 1024))
+                if not block:
+                    break
+                digest.update(block)
+                offset -= len(block)
+        return digest.hexdigest()
+
+    def appended(self, before):
+        # Called by the ledger after its own append: still trusted if it was before
+        if self.seen == before:
+            self.seen = self.stat()
+
+    def load_meta(self):
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            offset = meta["offset"]
+            stat = self.stat()
+            if (meta.get("format") != self.FORMAT or meta["file"] != os.path.basename(self.path)
+                    or meta["columns"] != self.columns
+                    or not os.path.exists(self.path) or not 0 <= offset <= stat[0]):
+                return None
+            if stat not in (meta["stat"], self.seen):
+                if meta["check"] != self.fingerprint(offset):
+                    return None
+                self.bytes_read += offset
+            self.seen = stat
+            return meta
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, df, offset):
+        # The old metadata goes first, so a crash mid-save only forces a rebuild
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        df = categorize(df.reset_index(drop=True))
+        tmp_path = self.path + ".tmp"
+        with metrics.timer("snapshot.save." + os.path.splitext(os.path.basename(self.csv_path))[0]) as t:
+            if feather is not None:
+                # Uncompressed so that reads can memory-map the file
+                feather.write_feather(df, tmp_path, compression="uncompressed")
+            else:
+                df.to_pickle(tmp_path)
+            t.rows = len(df)
+            t.bytes_written = os.path.getsize(tmp_path)
+        os.replace(tmp_path, self.path)
+        stat = self.stat()
+        write_atomic(self.meta_path, json.dumps({
+            "format": self.FORMAT, "file": os.path.basename(self.path), "columns": self.columns,
+            "offset": offset, "check": self.fingerprint(offset), "stat": stat,
+        }))
+        self.seen = stat
+
+    def load(self, columns=None):
+        self.bytes_read += os.path.getsize(self.path)
+        if feather is not None:
+            return feather.read_feather(self.path, columns=columns, memory_map=True)
+        df = pd.read_pickle(self.path)
+        return df if columns is None else df[list(columns)]
+
+    def read_tail(self, offset, size, columns=None):
+        with open(self.csv_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        self.bytes_read += len(data)
+        return pd.read_csv(io.BytesIO(data), header=None, names=self.columns, usecols=columns,
+                           dtype=text_dtypes(self.columns))
+
+    def append_tail(self, df, tail):
+        # An empty snapshot has untyped columns; take the tail's types instead
+        if df.empty:
+            return tail.reset_index(drop=True)
+        return pd.concat([df, tail], ignore_index=True)
+
+    def read(self, columns=None):
+        # Called with the ledger lock held; bytes_read counts the bytes it loads
+        self.bytes_read = 0
+        size = os.path.getsize(self.csv_path)
+        meta = self.load_meta()
+        try:
+            if meta is not None and size - meta["offset"] <= self.refresh_bytes:
+                df = self.load(columns)
+                if size > meta["offset"]:
+                    df = categorize(self.append_tail(df, self.read_tail(meta["offset"], size, columns)))
+                return df
+            if meta is not None:
+                df = self.append_tail(self.load(), self.read_tail(meta["offset"], size))
+            else:
+                df = pd.read_csv(self.csv_path, dtype=text_dtypes(self.columns))
+                self.bytes_read += size
+        except Exception:
+            df = pd.read_csv(self.csv_path, dtype=text_dtypes(self.columns))
+            self.bytes_read += size
+        try:
+            self.save(df, size)
+        except Exception:
+            # The CSV has been read anyway; the snapshot is rebuilt next time
+            self.remove()
+        df = categorize(df)
+        return df if columns is None else df[list(columns)]
+
+    def remove(self):
+        self.seen = None
+        for path in (self.meta_path, self.path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# Append-only CSV file: O(1) fsynced row appends, atomic whole-file rewrites.
+# With ids=True the first column is a persistent record ID, and deletes are
+# appended to a tombstone file (<name>.deleted.csv) that compaction applies.
+class CsvLedger:
+    def __init__(self, path, columns, compact_every=5000, compact_hook=None, snapshot=False, ids=False):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.ids = ids
+        self.columns = (["ID"] if ids else []) + list(columns)
+        self.snapshot = LedgerSnapshot(path, self.columns) if snapshot else None
+        self.compact_every = compact_every
+        self.compact_hook = compact_hook
+        self.appends_since_compact = 0
+        self.next_id = None
+        self.deleted = set()
+        # Tombstoned rows still in the file; compaction only has work to do when there are some
+        self.pending_deletes = 0
+        self.tombstones = (CsvLedger(os.path.splitext(path)[0] + ".deleted.csv", ["ID"], compact_every=0)
+                           if ids else None)
+        # Serializes appends, rewrites and reads of this file across threads
+        self.lock = threading.RLock()
+
+    def ensure(self):
+        with self.lock:
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                self.rewrite(pd.DataFrame(columns=self.columns))
+            else:
+                self.repair()
+            if self.ids:
+                self.tombstones.ensure()
+                self.add_ids()
+                self.load_ids()
+
+    def add_ids(self):
+        # One-time upgrade of a ledger written before records had IDs
+        with open(self.path, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), [])
+        if "ID" not in header:
+            df = pd.read_csv(self.path, dtype=text_dtypes(header))
+            df.insert(0, "ID", range(1, len(df) + 1))
+            self.rewrite(df)
+
+    def load_ids(self):
+        self.deleted = set(self.tombstones.read()["ID"].dropna().astype("int64"))
+        self.pending_deletes = len(self.deleted)
+        last = self.read(usecols=["ID"])["ID"].max()
+        self.next_id = max(0 if pd.isna(last) else int(last), max(self.deleted, default=0)) + 1
+
+    def complete_line(self, header, data):
+        # A last line saved without a newline (by an editor) rather than torn
+        # mid-append: every field present and the numeric ones parse
+        try:
+            fields = next(csv.reader([data.decode("utf-8")]))
+            for name, value in zip(header, fields):
+                if name in NUMERIC_COLUMNS:
+                    float(value)
+        except (UnicodeDecodeError, csv.Error, StopIteration, ValueError):
+            return False
+        return len(fields) == len(header)
+
+    def repair(self):
+        # Every append ends with a newline, so a last line without one was
+        # either torn by a crash mid-append, and is truncated back to the last
+        # newline, or saved that way outside the app, and is terminated.
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            pos = size - 1
+            block = 4096
+            last_newline = -1
+            while pos > 0 and last_newline < 0:
+                start = max(0, pos - block)
+                f.seek(start)
+                chunk = f.read(pos - start)
+                idx = chunk.rfind(b"\n")
+                if idx >= 0:
+                    last_newline = start + idx
+                pos = start
+            if last_newline < 0:
+                # Only a header line: keep it
+                complete = True
+            else:
+                f.seek(0)
+                header = next(csv.reader([f.readline().decode("utf-8", "replace")]), [])
+                f.seek(last_newline + 1)
+                complete = self.complete_line(header, f.read())
+            if complete:
+                f.seek(0, os.SEEK_END)
+                f.write(b"\n")
+            else:
+                f.truncate(last_newline + 1)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def format_rows(self, rows):
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        for row in rows:
+            writer.writerow(["" if row.get(col) is None else row.get(col) for col in self.columns])
+        return buf.getvalue()
+
+    def append(self, row):
+        self.append_many([row])
+
+    def append_many(self, rows):
+        if not rows:
+            return
+        with self.lock:
+            if self.ids:
+                # IDs are written back into the rows so callers can refer to them
+                if self.next_id is None:
+                    self.load_ids()
+                for row in rows:
+                    row["ID"] = self.next_id
+                    self.next_id += 1
+            data = self.format_rows(rows).encode("utf-8")
+            before = self.snapshot.stat() if self.snapshot is not None else None
+            # A single write of whole lines; a torn tail is repaired on next open
+            with metrics.timer("csv.append." + self.name) as t, open(self.path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                t.rows = len(rows)
+                t.bytes_written = len(data)
+            if self.snapshot is not None:
+                self.snapshot.appended(before)
+            self.appends_since_compact += len(rows)
+            if self.compact_every and self.pending_deletes and self.appends_since_compact >= self.compact_every:
+                self.compact()
+
+    def read(self, **kwargs):
+        with self.lock, metrics.timer("csv.read." + self.name) as t:
+            if self.snapshot is not None and set(kwargs) <= {"usecols"}:
+                df = self.snapshot.read(kwargs.get("usecols"))
+                t.bytes_read = self.snapshot.bytes_read
+            else:
+                kwargs.setdefault("dtype", text_dtypes(self.columns))
+                df = pd.read_csv(self.path, **kwargs)
+                t.bytes_read = os.path.getsize(self.path) if metrics.enabled else 0
+            t.rows = len(df)
+            return df
+
+    def records(self, columns=None):
+        # Live records indexed by ID, without the deleted ones
+        with self.lock:
+            df = self.read(usecols=None if columns is None else ["ID"] + [col for col in columns if col != "ID"])
+            if self.next_id is None:
+                self.load_ids()
+            deleted = self.deleted
+        df = df.set_index("ID")
+        df.index.name = None
+        return df[~df.index.isin(deleted)] if deleted else df
+
+    def fetch(self, ids):
+        # Live records with these IDs, without reading the whole ledger: IDs
+        # only grow down the file, so each one is a binary search over byte offsets
+        with self.lock:
+            if self.next_id is None:
+                self.load_ids()
+            wanted = sorted({int(record_id) for record_id in ids} - self.deleted)
+            lines = []
+            with metrics.timer("csv.fetch." + self.name) as t, open(self.path, "rb") as f:
+                lo = len(f.readline())
+                size = f.seek(0, os.SEEK_END)
+                for record_id in wanted:
+                    # IDs are sorted, so each search starts where the last one ended
+                    lo, line = self.find_line(f, lo, size, record_id)
+                    if line is not None:
+                        lines.append(line if line.endswith(b"\n") else line + b"\n")
+                t.rows = len(lines)
+        if not lines:
+            df = pd.DataFrame(columns=self.columns)
+        else:
+            df = pd.read_csv(io.BytesIO(b"".join(lines)), header=None, names=self.columns,
+                             dtype=text_dtypes(self.columns))
+        df = df.set_index("ID")
+        df.index.name = None
+        return df
+
+    def find_line(self, f, lo, hi, record_id):
+        # Offset of the first line with an ID >= record_id, and that line if its ID matches
+        def line_at(pos):
+            # First whole line starting at or after pos
+            f.seek(pos - 1)
+            f.readline()
+            return f.tell(), f.readline()
+
+        def line_id(line):
+            return int(line.split(b",", 1)[0])
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, line = line_at(mid)
+            if start >= hi or not line or line_id(line) >= record_id:
+                hi = mid
+            else:
+                lo = start + len(line)
+        start, line = line_at(lo)
+        return start, (line if line and line_id(line) == record_id else None)
+
+    def delete(self, ids):
+        # O(k): only the IDs are written; the rows go at the next compaction
+        with self.lock:
+            if self.next_id is None:
+                self.load_ids()
+            ids = sorted({int(record_id) for record_id in ids} - self.deleted)
+            if not ids:
+                return
+            with metrics.timer("csv.delete." + self.name) as t:
+                self.tombstones.append_many([{"ID": record_id} for record_id in ids])
+                t.rows = len(ids)
+            self.deleted = self.deleted | set(ids)
+            self.pending_deletes += len(ids)
+            if self.compact_every and self.pending_deletes >= self.compact_every:
+                self.compact()
+
+    def reset_tombstones(self, last):
+        # last: highest ID still in the ledger. Keeps the highest ID ever
+        # issued, if it is gone, so it is never reused.
+        last = 0 if pd.isna(last) else last
+        keep = [self.next_id - 1] if self.next_id - 1 > last else []
+        self.tombstones.rewrite(pd.DataFrame({"ID": keep}))
+        self.deleted = set(keep)
+        self.pending_deletes = 0
+
+    def rewrite(self, df):
+        tmp_path = self.path + ".tmp"
+        with self.lock:
+            with metrics.timer("csv.rewrite." + self.name) as t:
+                with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                    df.to_csv(f, index=False, lineterminator="\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                t.rows = len(df)
+                t.bytes_written = os.path.getsize(tmp_path) if metrics.enabled else 0
+            os.replace(tmp_path, self.path)
+            fsync_dir(self.path)
+            if self.snapshot is not None:
+                try:
+                    self.snapshot.save(df, os.path.getsize(self.path))
+                except Exception:
+                    self.snapshot.remove()
+
+    def compact(self):
+        with self.lock:
+            df = self.read()
+            if self.ids:
+                if self.next_id is None:
+                    self.load_ids()
+                df = df[~df["ID"].isin(self.deleted)]
+            if self.compact_hook:
+                df = self.compact_hook(df)
+            self.rewrite(df)
+            if self.ids:
+                self.reset_tombstones(df["ID"].max())
+            self.appends_since_compact = 0
+
+    def split_before(self, cutoff, sink=None, chunksize=50000):
+        # Streams the ledger chunk by chunk, as text: rows dated before cutoff
+        # go to sink(chunk), the rest to a new file. Nothing changes until the
+        # returned finish() swaps that file in; no other write may come between.
+        with self.lock:
+            if self.ids and self.next_id is None:
+                self.load_ids()
+            size = os.path.getsize(self.path)
+            tmp_path = self.path + ".split.tmp"
+            last = 0
+            with metrics.timer("csv.split." + self.name) as t, \
+                    open(tmp_path, "w", newline="", encoding="utf-8") as out:
+                out.write(self.format_rows([{col: col for col in self.columns}]))
+                for chunk in pd.read_csv(self.path, dtype=str, keep_default_na=False, chunksize=chunksize):
+                    if self.ids and self.deleted:
+                        chunk = chunk[~pd.to_numeric(chunk["ID"], errors="coerce").isin(self.deleted)]
+                    dates = chunk["Date"].str.strip()
+                    old = (dates >= "0000-00-00") & (dates < cutoff)
+                    if sink is not None and old.any():
+                        sink(chunk[old])
+                    keep = chunk[~old]
+                    keep.to_csv(out, index=False, header=False, lineterminator="\n")
+                    if self.ids and not keep.empty:
+                        last = max(last, int(pd.to_numeric(keep["ID"], errors="coerce").max()))
+                    t.rows += len(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+                t.bytes_read = size
+
+        def finish():
+            with self.lock:
+                if os.path.getsize(self.path) != size:
+                    raise RuntimeError(f"{self.path} changed while it was being archived")
+                os.replace(tmp_path, self.path)
+                fsync_dir(self.path)
+                if self.snapshot is not None:
+                    self.snapshot.remove()
+                if self.ids:
+                    self.reset_tombstones(last)
+                self.appends_since_compact = 0
+        return finish
+
+    def clear(self):
+        with self.lock:
+            df = pd.DataFrame(columns=self.columns)
+            if self.ids and self.next_id is None:
+                self.load_ids()
+            self.rewrite(df)
+            if self.ids:
+                self.reset_tombstones(df["ID"].max())
+            self.appends_since_compact = 0
+
+
+TABLE_COLUMNS = {
+    "purchase": PURCHASE_COLUMNS,
+    "sale": SALE_COLUMNS,
+    "model": MODEL_COLUMNS,
+}
+
+
+# Backend interface shared by CsvBackend and SqliteBackend. Tables are
+# "purchase", "sale" and "model"; read() returns a DataFrame whose index is the
+# record key to pass back to delete(). Purchase and sale keys are persistent
+# record IDs, which append()/append_many() also write into each row as "ID".
+class CsvBackend:
+    name = "csv"
+
+    def __init__(self, purchase_file="purchase_data.csv", sale_file="sale_data.csv",
+                 model_file="model_history.csv", snapshots=True):
+        self.ledgers = {
+            "purchase": CsvLedger(purchase_file, PURCHASE_COLUMNS, snapshot=snapshots, ids=True),
+            "sale": CsvLedger(sale_file, SALE_COLUMNS, snapshot=snapshots, ids=True),
+            "model": CsvLedger(model_file, MODEL_COLUMNS, compact_hook=lambda df: df.drop_duplicates()),
+        }
+        # Per table, normalized (item, company, model) -> record IDs, built on
+        # the first keyed read and kept up to date by appends. IDs deleted
+        # since are left in and skipped by fetch().
+        self.key_index = {}
+
+    def ensure(self):
+        for ledger in self.ledgers.values():
+            ledger.ensure()
+
+    def append(self, table, row):
+        self.ledgers[table].append(row)
+
+    def append_many(self, table, rows):
+        ledger = self.ledgers[table]
+        with ledger.lock:
+            ledger.append_many(rows)
+            index = self.key_index.get(table)
+            if index is not None:
+                for row in rows:
+                    index.setdefault(normalized_key(row, KEY_COLUMNS[table]), []).append(row["ID"])
+
+    def key_ids(self, table, keys):
+        ledger = self.ledgers[table]
+        with ledger.lock:
+            index = self.key_index.get(table)
+            if index is None:
+                index = self.key_index[table] = key_ids(ledger.records(KEY_COLUMNS[table]), KEY_COLUMNS[table])
+            return [record_id for key in keys for record_id in index.get(tuple(key), ())]
+
+    def read(self, table, columns=None, keys=None, start=None, end=None):
+        # keys: normalized (item, company, model) tuples to keep, looked up in
+        # the key index and fetched by ID; start/end: inclusive YYYY-MM-DD
+        # bounds on Date. Both for purchase and sale only.
+        ledger = self.ledgers[table]
+        dated = start is not None or end is not None
+        if keys is not None:
+            df = self.fetch(table, self.key_ids(table, keys))
+        else:
+            needed = None if columns is None else list(dict.fromkeys(list(columns) + (["Date"] if dated else [])))
+            df = ledger.records(needed) if ledger.ids else ledger.read(usecols=needed)
+        if dated:
+            df = df[in_range(df["Date"], start, end)]
+        return df if columns is None else df[list(columns)]
+
+    def fetch(self, table, ids):
+        try:
+            return self.ledgers[table].fetch(ids)
+        except ValueError:
+            # A line that does not start with an ID (edited by hand): fall back to a full read
+            df = self.read(table)
+            return df.loc[df.index.intersection([int(record_id) for record_id in ids])]
+
+    def delete(self, table, keys):
+        ledger = self.ledgers[table]
+        if ledger.ids:
+            ledger.delete(keys)
+            return
+        with ledger.lock:
+            df = ledger.read()
+            ledger.rewrite(df.drop(list(keys)).reset_index(drop=True))
+
+    def clear(self, table):
+        self.key_index.pop(table, None)
+        self.ledgers[table].clear()
+
+    def archive_before(self, table, cutoff, sink=None, chunksize=50000):
+        self.key_index.pop(table, None)
+        return self.ledgers[table].split_before(cutoff, sink, chunksize)
+
+    def marker(self, table):
+        # Size and mtime of the ledger and its tombstones: changes with every
+        # append, delete, compaction or outside edit, even one that keeps the size; O(1)
+        ledger = self.ledgers[table]
+        with ledger.lock:
+            paths = [ledger.path] + ([ledger.tombstones.path] if ledger.ids else [])
+            return [value for path in paths for value in (os.stat(path).st_size, os.stat(path).st_mtime_ns)]
+
+    def compact(self):
+        for ledger in self.ledgers.values():
+            ledger.compact()
+
+    def close(self):
+        pass
+
+
+def sql_name(column):
+    return column.lower().replace(" ", "_")
+
+
+class SqliteBackend:
+    name = "sqlite"
+    TABLES = {"purchase": "purchases", "sale": "sales", "model": "model_history"}
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS purchases (
+            id INTEGER PRIMARY KEY, date TEXT, item TEXT, company TEXT, model TEXT,
+            dealer TEXT, city TEXT, price_per_unit REAL, units_purchased INTEGER)""",
+        """CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY, date TEXT, sale_dealer TEXT, item_sold TEXT, company TEXT,
+            model TEXT, units_sold INTEGER, sale_price_per_unit REAL, total_bill REAL, profit REAL)""",
+        """CREATE TABLE IF NOT EXISTS model_history (
+            id INTEGER PRIMARY KEY, item TEXT, company TEXT, model TEXT, UNIQUE (item, company, model))""",
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+        "CREATE INDEX IF NOT EXISTS idx_purchases_date ON purchases (date)",
+        "CREATE INDEX IF NOT EXISTS idx_purchases_key ON purchases (item COLLATE NOCASE, company COLLATE NOCASE, model COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (date)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_key ON sales (item_sold COLLATE NOCASE, company COLLATE NOCASE, model COLLATE NOCASE)",
+    ]
+
+    def __init__(self, path="aaa_traders.db"):
+        self.path = path
+        self.conn = None
+        # One connection shared by the worker threads, used one at a time
+        self.lock = threading.RLock()
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        return self.conn
+
+    def ensure(self):
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+
+    def insert_sql(self, table):
+        columns = ([] if table == "model" else ["id"]) + [sql_name(col) for col in TABLE_COLUMNS[table]]
+        verb = "INSERT OR IGNORE" if table == "model" else "INSERT"
+        return (f"{verb} INTO {self.TABLES[table]} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})")
+
+    def append(self, table, row):
+        self.append_many(table, [row])
+
+    def append_many(self, table, rows):
+        if not rows:
+            return
+        with self.lock, metrics.timer("sqlite.append." + table) as t:
+            t.rows = len(rows)
+            conn = self.connect()
+            with conn:
+                self.insert_rows(conn, table, rows)
+
+    def insert_rows(self, conn, table, rows):
+        # Inside the caller's transaction
+        columns = TABLE_COLUMNS[table]
+        if table == "model":
+            conn.executemany(self.insert_sql(table), [tuple(row.get(col) for col in columns) for row in rows])
+            return
+        last = self.last_id(conn, table)
+        for row in rows:
+            if row.get("ID") is None:
+                last += 1
+                row["ID"] = last
+            else:
+                row["ID"] = int(row["ID"])
+                last = max(last, row["ID"])
+        conn.executemany(self.insert_sql(table),
+                         [(row["ID"],) + tuple(row.get(col) for col in columns) for row in rows])
+        self.save_last_id(conn, table, last)
+
+    def last_id(self, conn, table):
+        # Highest record ID ever issued; kept in meta so IDs are never reused,
+        # even after the newest records are deleted
+        stored = conn.execute("SELECT value FROM meta WHERE key = ?", (f"last_id_{table}",)).fetchone()
+        return max(int(stored[0]) if stored else 0,
+                   conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.TABLES[table]}").fetchone()[0])
+
+    def save_last_id(self, conn, table, last):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"last_id_{table}", str(last)))
+
+    def note_removal(self, conn, table):
+        # Called before rows are deleted: pins the last ID and counts the change
+        self.save_last_id(conn, table, self.last_id(conn, table))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                     (f"removals_{table}", str(self.meta_int(conn, f"removals_{table}") + 1)))
+
+    def meta_int(self, conn, key):
+        stored = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(stored[0]) if stored else 0
+
+    def marker(self, table):
+        # Changes with every append (last ID) and every delete (removal count)
+        with self.lock:
+            conn = self.connect()
+            return [self.last_id(conn, table), self.meta_int(conn, f"removals_{table}")]
+
+    def select(self, table, columns=None, where="", params=()):
+        columns = list(columns or TABLE_COLUMNS[table])
+        selected = ", ".join(f'{sql_name(col)} AS "{col}"' for col in columns)
+        df = pd.read_sql_query(f"SELECT id, {selected} FROM {self.TABLES[table]}"
+                               f"{' WHERE ' + where if where else ''} ORDER BY id",
+                               self.connect(), params=list(params), index_col="id")
+        df.index.name = None
+        return df
+
+    def select_batches(self, table, columns, match, values, batch_size, where="", params=()):
+        # One query per batch of OR-ed matches, to stay under SQLite's parameter limit
+        prefix = f"{where} AND " if where else ""
+        frames = [self.select(table, columns, prefix + "(" + " OR ".join([match] * len(batch)) + ")",
+                              list(params) + [param for value in batch for param in value])
+                  for batch in (values[i:i + batch_size] for i in range(0, len(values), batch_size))]
+        if not frames:
+            return self.select(table, columns, "0")
+        return frames[0] if len(frames) == 1 else pd.concat(frames).sort_index()
+
+    def read(self, table, columns=None, keys=None, start=None, end=None):
+        # keys: normalized (item, company, model) tuples, matched through the NOCASE key index;
+        # start/end: inclusive YYYY-MM-DD bounds, matched through the date index
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(str(start)[:10])
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(str(end)[:10])
+        where = " AND ".join(conditions)
+        with self.lock, metrics.timer("sqlite.read." + table) as t:
+            if keys is None:
+                df = self.select(table, columns, where, params)
+            else:
+                item, company, model = (sql_name(col) for col in KEY_COLUMNS[table])
+                match = f"({item} = ? COLLATE NOCASE AND {company} = ? COLLATE NOCASE AND {model} = ? COLLATE NOCASE)"
+                df = self.select_batches(table, columns, match, [tuple(key) for key in keys], 300, where, params)
+            t.rows = len(df)
+        return df
+
+    def fetch(self, table, ids):
+        ids = sorted({int(record_id) for record_id in ids})
+        with self.lock, metrics.timer("sqlite.fetch." + table) as t:
+            df = self.select_batches(table, None, "id = ?", [(record_id,) for record_id in ids], 900)
+            t.rows = len(df)
+        return df
+
+    def delete(self, table, keys):
+        with self.lock, metrics.timer("sqlite.delete." + table) as t:
+            t.rows = len(keys)
+            conn = self.connect()
+            with conn:
+                if table != "model":
+                    self.note_removal(conn, table)
+                conn.executemany(f"DELETE FROM {self.TABLES[table]} WHERE id = ?", [(int(key),) for key in keys])
+
+    def clear(self, table):
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                if table != "model":
+                    self.note_removal(conn, table)
+                conn.execute(f"DELETE FROM {self.TABLES[table]}")
+
+    def archive_before(self, table, cutoff, sink=None, chunksize=50000):
+        # Same contract as CsvLedger.split_before: rows dated before cutoff
+        # are streamed to sink(chunk) now and deleted by the returned finish()
+        where = f"FROM {self.TABLES[table]} WHERE date >= '0000-00-00' AND date < ?"
+        if sink is not None:
+            columns = TABLE_COLUMNS[table]
+            selected = ", ".join(f'{sql_name(col)} AS "{col}"' for col in columns)
+            with self.lock, metrics.timer("sqlite.split." + table) as t:
+                for chunk in pd.read_sql_query(f"SELECT id AS ID, {selected} {where} ORDER BY id",
+                                               self.connect(), params=(cutoff,), chunksize=chunksize):
+                    sink(chunk)
+                    t.rows += len(chunk)
+
+        def finish():
+            with self.lock:
+                conn = self.connect()
+                with conn:
+                    self.note_removal(conn, table)
+                    conn.execute(f"DELETE {where}", (cutoff,))
+        return finish
+
+    def compact(self):
+        with self.lock:
+            conn = self.connect()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def import_csv(self, csv_backend, batch_size=10000):
+        # One-shot migration: copy the CSV ledgers in batches the first time the
+        # database is opened, and never again afterwards. The copy and the
+        # csv_imported marker share one transaction, so an interrupted import
+        # leaves nothing behind; rows left by an older, per-batch import are
+        # cleared before retrying.
+        with self.lock:
+            conn = self.connect()
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_imported'").fetchone():
+                return False
+            with conn, metrics.timer("sqlite.import_csv") as t:
+                for table, name in self.TABLES.items():
+                    conn.execute(f"DELETE FROM {name}")
+                conn.execute("DELETE FROM meta")
+                for table, ledger in csv_backend.ledgers.items():
+                    if not os.path.exists(ledger.path) or os.path.getsize(ledger.path) == 0:
+                        continue
+                    deleted = set()
+                    if ledger.ids and os.path.exists(ledger.tombstones.path) and os.path.getsize(ledger.tombstones.path):
+                        deleted = set(pd.read_csv(ledger.tombstones.path)["ID"])
+                    for chunk in pd.read_csv(ledger.path, dtype=text_dtypes(ledger.columns), chunksize=batch_size):
+                        if "ID" in chunk.columns:
+                            chunk = chunk[~chunk["ID"].isin(deleted)]
+                        chunk = chunk.astype(object).where(chunk.notna(), None)
+                        self.insert_rows(conn, table, chunk.to_dict("records"))
+                        t.rows += len(chunk)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('csv_imported', ?)",
+                             (datetime.now().isoformat(timespec="seconds"),))
+        return True
+
+
+def make_backend(kind="csv", db_path="aaa_traders.db", **csv_files):
+    if kind == "csv":
+        return CsvBackend(**csv_files)
+    if kind == "sqlite":
+        backend = SqliteBackend(db_path)
+        backend.ensure()
+        backend.import_csv(CsvBackend(**csv_files))
+        return backend
+    raise ValueError(f"Unknown storage backend '{kind}' (expected 'csv' or 'sqlite')")
@@ -0,0 +1,145 @@
+import tkinter as tk
+from tkinter import ttk
+import pandas as pd
+
+
+def filter_sort(df, text, column=None, ascending=True):
+    # Rows containing text in any column (case-insensitive), sorted by column
+    view = df
+    if text:
+        mask = pd.Series(False, index=view.index)
+        for col in view.columns:
+            mask |= view[col].astype(str).str.lower().str.contains(text, regex=False)
+        view = view[mask]
+    if column is not None and column in view.columns:
+        view = view.sort_values(column, ascending=ascending, kind="stable")
+    return view
+
+
+# Treeview over a DataFrame that only materializes the rows scrolled into view.
+# Sorting and filtering run on the DataFrame, on the background worker when one
+# is given, then the first page is re-rendered. Typing in the filter box
+# re-filters once it pauses for debounce_ms.
+class VirtualTable:
+    def __init__(self, frame, df, page_size=200, worker=None, debounce_ms=300):
+        self.frame = frame
+        self.df = df
+        self.view = df
+        self.page_size = page_size
+        self.worker = worker
+        self.debounce_ms = debounce_ms
+        self.loaded = 0
+        self.keys = {}
+        self.sort_column = None
+        self.sort_ascending = True
+        self.loading = False
+        # Only the latest refresh is shown; earlier ones still running are dropped
+        self.generation = 0
+        self.pending_filter = None
+
+        toolbar = ttk.Frame(frame)
+        toolbar.pack(fill='x', pady=5)
+        ttk.Label(toolbar, text="Filter").pack(side=tk.LEFT, padx=5)
+        self.filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(toolbar, textvariable=self.filter_var, width=30)
+        filter_entry.pack(side=tk.LEFT, padx=5)
+        filter_entry.bind('<Return>', lambda event: self.refresh_view())
+        filter_entry.bind('<KeyRelease>', self.on_filter_typed)
+        ttk.Button(toolbar, text="Apply", command=self.refresh_view).pack(side=tk.LEFT, padx=5)
+        self.status = ttk.Label(toolbar, text="")
+        self.status.pack(side=tk.RIGHT, padx=5)
+
+        self.tree = ttk.Treeview(frame, columns=list(df.columns), show='headings')
+        for col in df.columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=100)
+        self.scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(fill='both', expand=True)
+        self.reset()
+
+    def set_data(self, df):
+        self.df = df
+        self.refresh_view()
+
+    def remove_rows(self, keys):
+        # Drops only these records; rows already rendered stay in place
+        keys = list(keys)
+        self.df = self.df.drop(self.df.index.intersection(keys))
+        self.view = self.view.drop(self.view.index.intersection(keys))
+        shown = [str(key) for key in keys if str(key) in self.keys]
+        self.tree.delete(*shown)
+        for iid in shown:
+            del self.keys[iid]
+        self.loaded -= len(shown)
+        self.update_status()
+
+    def on_filter_typed(self, event):
+        if event.keysym == "Return":
+            return
+        if self.pending_filter is not None:
+            self.tree.after_cancel(self.pending_filter)
+        self.pending_filter = self.tree.after(self.debounce_ms, self.refresh_view)
+
+    def refresh_view(self):
+        if self.pending_filter is not None:
+            self.tree.after_cancel(self.pending_filter)
+            self.pending_filter = None
+        self.generation += 1
+        generation, df = self.generation, self.df
+        args = (df, self.filter_var.get().strip().lower(), self.sort_column, self.sort_ascending)
+        if self.worker is None:
+            self.show_view(generation, df, filter_sort(*args))
+            return
+        self.status.configure(text="Filtering...")
+        self.worker.read(filter_sort, *args, on_done=lambda view: self.show_view(generation, df, view))
+
+    def show_view(self, generation, df, view):
+        if generation != self.generation or not self.tree.winfo_exists():
+            return
+        if df is not self.df:
+            # Rows deleted while the view was computed
+            view = view[view.index.isin(self.df.index)]
+        self.view = view
+        self.reset()
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_ascending = not self.sort_ascending
+        else:
+            self.sort_column = column
+            self.sort_ascending = True
+        for col in self.df.columns:
+            arrow = (" ▲" if self.sort_ascending else " ▼") if col == column else ""
+            self.tree.heading(col, text=col + arrow)
+        self.refresh_view()
+
+    def reset(self):
+        self.tree.delete(*self.tree.get_children())
+        self.keys = {}
+        self.loaded = 0
+        self.load_more()
+
+    def load_more(self):
+        self.loading = False
+        chunk = self.view.iloc[self.loaded:self.loaded + self.page_size]
+        for key, values in zip(chunk.index, chunk.itertuples(index=False, name=None)):
+            iid = str(key)
+            self.keys[iid] = key
+            self.tree.insert("", tk.END, values=values, iid=iid)
+        self.loaded += len(chunk)
+        self.update_status()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.9 and self.loaded < len(self.view) and not self.loading:
+            self.loading = True
+            self.tree.after_idle(self.load_more)
+
+    def update_status(self):
+        self.status.configure(text=f"Showing {self.loaded} of {len(self.view)} rows"
+                              + (f" (filtered from {len(self.df)})" if len(self.view) != len(self.df) else ""))
+
+    def selected_keys(self):
+        return [self.keys[iid] for iid in self.tree.selection()]
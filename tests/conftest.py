@@ -0,0 +1,49 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import make_backend  # noqa: E402
+from core import TradersCore  # noqa: E402
+
+
+def ledger_files(directory):
+    return {
+        "purchase_file": os.path.join(directory, "purchase_data.csv"),
+        "sale_file": os.path.join(directory, "sale_data.csv"),
+        "model_file": os.path.join(directory, "model_history.csv"),
+    }
+
+
+# Opens a TradersCore over ledgers in tmp_path, loaded the way app.py does at
+# startup. Calling it again reopens the same files, as after a restart.
+@pytest.fixture(params=["csv", "sqlite"])
+def open_core(request, tmp_path):
+    opened = []
+
+    def open_core(costing="fifo"):
+        storage = make_backend(request.param, db_path=str(tmp_path / "aaa_traders.db"), **ledger_files(str(tmp_path)))
+        storage.ensure()
+        core = TradersCore(storage, str(tmp_path / "monthly_sales.json"), costing=costing,
+                           archive_dir=str(tmp_path / "archive"))
+        core.load_model_history()
+        core.rebuild_cost_index()
+        core.rebuild_inventory()
+        core.load_monthly_sales()
+        opened.append(core)
+        return core
+
+    yield open_core
+    for core in opened:
+        core.close()
+
+
+def purchase(core, date, model, units, price, item="Laptop", company="Dell"):
+    return core.add_purchase({"Date": date, "Item": item, "Company": company, "Model": model, "Dealer": "Ali",
+                              "City": "Lahore", "Price Per Unit": price, "Units Purchased": units})
+
+
+def sale(core, date, model, units, price, item="Laptop", company="Dell"):
+    return core.add_sale({"Date": date, "Sale Dealer": "Bilal", "Item Sold": item, "Company": company,
+                          "Model": model, "Units Sold": units, "Sale Price Per Unit": price})
@@ -0,0 +1,50 @@
+import os
+import pandas as pd
+from aggregates import SalesAggregates
+from conftest import purchase, sale
+
+
+def reopened_report(open_core):
+    # A fresh core over the same files, without closing the previous one (as after a crash)
+    return open_core().monthly_report()[1]
+
+
+def test_sales_are_journaled_and_replayed_on_load(open_core, tmp_path):
+    core = open_core()
+    purchase(core, "2025-01-05", "X1", 20, 100.0)
+    sale(core, "2025-01-06", "X1", 3, 150.0)
+    sale(core, "2025-02-06", "X1", 2, 160.0)
+    core.delete("sale", list(core.read("sale").index[:1]))
+    assert os.path.exists(tmp_path / "monthly_sales.journal")
+    expected = core.monthly_report()[1]
+    assert list(expected["Units Sold"]) == [2]
+    assert reopened_report(open_core).equals(expected)
+
+
+def test_sale_missing_from_the_journal_triggers_a_rebuild(open_core):
+    core = open_core()
+    purchase(core, "2025-01-05", "X1", 20, 100.0)
+    sale(core, "2025-01-06", "X1", 3, 150.0)
+    # Crash between the ledger append and the journal append
+    row = core.sale_row({"Date": "2025-01-07", "Sale Dealer": "Bilal", "Item Sold": "Laptop", "Company": "Dell",
+                         "Model": "X1", "Units Sold": 4, "Sale Price Per Unit": 150.0})
+    core.storage.append_many("sale", [row])
+    assert list(reopened_report(open_core)["Units Sold"]) == [7]
+
+
+def test_journal_is_folded_into_the_file(tmp_path):
+    path = str(tmp_path / "monthly_sales.json")
+    aggregates = SalesAggregates(path, fold_every=3)
+    aggregates.build(pd.DataFrame(columns=["Date", "Item Sold", "Sale Dealer", "Units Sold", "Total Bill", "Profit"]))
+    row = {"Date": "2025-01-06", "Item Sold": "Laptop", "Sale Dealer": "Bilal", "Units Sold": 1,
+           "Total Bill": 150.0, "Profit": 50.0}
+    for _ in range(4):
+        aggregates.add_sale(row)
+    assert aggregates.journaled == 1
+    # A line torn by a crash mid-append is ignored
+    with open(aggregates.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"generation": ')
+    loaded = SalesAggregates(path)
+    assert loaded.load() and loaded.totals == {("2025-01", "Laptop", "Bilal"): [4.0, 600.0, 200.0, 4.0]}
+    loaded.close()
+    assert not os.path.exists(loaded.journal_path)
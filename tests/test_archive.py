@@ -0,0 +1,41 @@
+from datetime import datetime
+from conftest import purchase, sale
+
+
+def test_numeric_looking_model_survives_archive_and_sale(open_core):
+    core = open_core()
+    purchase(core, "2024-01-10", "0123", 10, 100.0)
+    sale(core, "2024-02-01", "0123", 2, 150.0)
+    core.archive_before("2024-03")
+    today = datetime.now().strftime("%Y-%m-%d")
+    purchase(core, today, "0123", 5, 200.0)
+
+    core = open_core()
+    stock = core.stock_levels()
+    assert list(stock["Model"]) == ["0123"]
+    assert stock["On Hand"].iloc[0] == 13
+    assert core.cost_index.lookup("laptop", "dell", "0123") == 100.0
+    assert [row[2] for row in core.archive.state["prices"]] == ["0123"]
+    # FIFO sells from the archived 100.0 layer first
+    assert sale(core, today, "0123", 1, 150.0)["Profit"] == 50.0
+    assert set(core.read_history("sale", "2024-01-01")["Model"]) == {"0123"}
+    report = core.analytics_report("purchase", "Model", "2024-01-01")
+    assert list(report["Model"]) == ["0123"] and report["Units Purchased"].iloc[0] == 15
+
+
+def test_archive_carries_stock_and_prices_forward(open_core):
+    core = open_core()
+    purchase(core, "2024-01-10", "X1", 10, 100.0)
+    purchase(core, "2024-02-10", "X1", 10, 120.0)
+    sale(core, "2024-02-20", "X1", 12, 150.0)
+    purchase(core, "2024-05-01", "X1", 4, 130.0)
+    before = core.stock_levels()
+    counts = core.archive_before("2024-03")
+    assert counts == {"purchase": 2, "sale": 1}
+    assert len(core.read("purchase")) == 1 and core.read("sale").empty
+
+    core = open_core()
+    assert core.stock_levels().equals(before)
+    assert core.cost_index.lookup("laptop", "dell", "x1") == 100.0
+    # 8 units left in the 120.0 layer are sold before the live 130.0 purchase
+    assert sale(core, "2024-05-02", "X1", 9, 150.0)["Profit"] == 8 * 30.0 + 20.0
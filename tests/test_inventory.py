@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+from benchmark import generate_ledgers
+from cost_index import normalize_key
+from inventory import InventoryEngine
+from conftest import purchase, sale
+
+
+def state(engine):
+    return ({key: [list(layer) for layer in layers] for key, layers in engine.layers.items()}, engine.on_hand)
+
+
+@pytest.mark.parametrize("method", ["fifo", "average"])
+def test_rebuild_keys_matches_a_full_build(method):
+    purchases, sales, _ = generate_ledgers(3000, seed=4)
+    opening = [["Laptop", "Dell", "Old-1", [[4, 90.0], [2, 95.0]]]]
+    full = InventoryEngine(method)
+    full.build(purchases, sales, opening)
+
+    keys = list(full.layers)[:5] + [("laptop", "dell", "old-1")]
+    engine = InventoryEngine(method)
+    engine.build(purchases, sales, opening)
+    for key in keys:
+        engine.layers[key].clear()
+        engine.on_hand[key] = -1
+    wanted = set(keys)
+    in_keys = lambda df, cols: [normalize_key(*row) in wanted for row in df[cols].itertuples(index=False, name=None)]
+    engine.rebuild_keys(keys, purchases[in_keys(purchases, ["Item", "Company", "Model"])],
+                        sales[in_keys(sales, ["Item Sold", "Company", "Model"])], opening)
+    assert state(engine) == state(full)
+
+
+@pytest.mark.parametrize("costing", ["fifo", "average"])
+def test_backdated_entries_match_a_replay_in_date_order(open_core, costing):
+    core = open_core(costing)
+    purchase(core, "2025-03-01", "X1", 5, 100.0)
+    sale(core, "2025-03-10", "X1", 5, 150.0)
+    # Backdated purchase, and a restock on the day of an earlier sale
+    purchase(core, "2025-03-05", "X1", 5, 200.0)
+    purchase(core, "2025-02-20", "X1", 3, 300.0)
+    sale(core, "2025-03-12", "X1", 2, 150.0)
+    purchase(core, "2025-03-12", "X1", 4, 110.0)
+    assert core.stock_levels().equals(open_core(costing).stock_levels())
+
+
+@pytest.mark.parametrize("costing", ["fifo", "average"])
+def test_delete_rederives_only_the_deleted_models(open_core, costing):
+    core = open_core(costing)
+    purchase(core, "2025-03-01", "X1", 5, 100.0)
+    purchase(core, "2025-03-02", "X1", 5, 120.0)
+    purchase(core, "2025-03-02", "Y1", 3, 50.0, company="HP")
+    sale(core, "2025-03-03", "X1", 6, 150.0)
+    sale(core, "2025-03-04", "Y1", 1, 70.0, company="HP")
+    first = core.read("purchase").index[0]
+    deleted = core.delete("purchase", [first, 10 ** 6])
+    assert list(deleted.index) == [first]
+    deleted = core.delete("sale", list(core.read("sale").index[:1]))
+    assert len(deleted) == 1
+    reopened = open_core(costing)
+    assert core.stock_levels().equals(reopened.stock_levels())
+    assert core.cost_index.prices == reopened.cost_index.prices
+    assert core.cost_index.lookup("laptop", "dell", "x1") == 120.0
+    assert core.monthly_report()[1].equals(reopened.monthly_report()[1])
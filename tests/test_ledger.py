@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+from storage import CsvLedger, SALE_COLUMNS
+
+HEADER = "ID," + ",".join(SALE_COLUMNS) + "\n"
+ROW = "1,2025-01-06,Bilal,Laptop,Dell,X1,2,150.0,300.0,100.0\n"
+
+
+def sale_ledger(path, compact_every=5000):
+    ledger = CsvLedger(str(path), SALE_COLUMNS, compact_every=compact_every, ids=True)
+    ledger.ensure()
+    return ledger
+
+
+def sale(units=1):
+    return {"Date": "2025-01-06", "Sale Dealer": "Bilal", "Item Sold": "Laptop", "Company": "Dell", "Model": "X1",
+            "Units Sold": units, "Sale Price Per Unit": 150.0, "Total Bill": 150.0 * units, "Profit": 50.0 * units}
+
+
+@pytest.mark.parametrize("tail", ["2,2025-01-07,Bilal,Lap", "2,2025-01-07,Bilal,Laptop,Dell,X1,3,150.0,45",
+                                  "2,2025-01-07,Bilal,Laptop,Dell,X1,3,150.0,450.0,1.5e"])
+def test_repair_drops_a_torn_last_line(tmp_path, tail):
+    path = tmp_path / "sale_data.csv"
+    path.write_text(HEADER + ROW + tail)
+    ledger = sale_ledger(path)
+    assert path.read_text() == HEADER + ROW
+    assert list(ledger.records().index) == [1]
+
+
+def test_repair_keeps_a_complete_last_line_without_newline(tmp_path):
+    path = tmp_path / "sale_data.csv"
+    last = "2,2025-01-07,Bilal,Laptop,Dell,X1,3,150.0,450.0,150.0"
+    path.write_text(HEADER + ROW + last)
+    ledger = sale_ledger(path)
+    assert path.read_text() == HEADER + ROW + last + "\n"
+    assert list(ledger.records()["Units Sold"]) == [2, 3]
+    ledger.append(sale())
+    assert list(ledger.records().index) == [1, 2, 3]
+
+
+def test_repair_terminates_a_header_only_file(tmp_path):
+    path = tmp_path / "sale_data.csv"
+    path.write_text(HEADER.rstrip("\n"))
+    assert sale_ledger(path).records().empty
+    assert path.read_text() == HEADER
+
+
+def test_appends_alone_never_rewrite_the_ledger(tmp_path, monkeypatch):
+    ledger = sale_ledger(tmp_path / "sale_data.csv", compact_every=3)
+    monkeypatch.setattr(ledger, "compact", lambda: pytest.fail("compacted with nothing to drop"))
+    for _ in range(7):
+        ledger.append(sale())
+    assert len(ledger.records()) == 7
+
+
+def test_tombstones_hide_records_until_compaction_drops_them(tmp_path):
+    path = tmp_path / "sale_data.csv"
+    ledger = sale_ledger(path, compact_every=3)
+    ledger.append_many([sale(units) for units in range(1, 6)])
+    ledger.delete([2, 5])
+    assert list(ledger.records().index) == [1, 3, 4]
+    assert len(pd.read_csv(path)) == 5
+    assert list(sale_ledger(path).records().index) == [1, 3, 4]
+    # Pending tombstones: the third append compacts
+    ledger.append_many([sale(), sale(), sale()])
+    assert list(pd.read_csv(path)["ID"]) == [1, 3, 4, 6, 7, 8]
+    assert ledger.deleted == set()
+    # The newest ID is never reused, even once its row is gone
+    ledger.delete([8])
+    ledger.compact()
+    ledger.append(sale())
+    assert list(sale_ledger(path).records().index) == [1, 3, 4, 6, 7, 9]
@@ -0,0 +1,144 @@
+import os
+import pandas as pd
+import pytest
+from benchmark import generate_ledgers, write_ledgers
+from storage import make_backend, CsvBackend, SqliteBackend
+
+
+def opened_csv(files):
+    backend = CsvBackend(**files)
+    backend.ensure()
+    return backend
+
+
+@pytest.fixture
+def csv_files(tmp_path):
+    purchases, sales, models = generate_ledgers(500, seed=1)
+    return write_ledgers(str(tmp_path), purchases, sales, models)
+
+
+def test_interrupted_sqlite_import_is_retried_from_scratch(tmp_path, csv_files, monkeypatch):
+    db_path = str(tmp_path / "aaa_traders.db")
+    backend = SqliteBackend(db_path)
+    backend.ensure()
+    calls = []
+
+    def insert_rows(conn, table, rows):
+        calls.append(table)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        SqliteBackend.insert_rows(backend, conn, table, rows)
+
+    monkeypatch.setattr(backend, "insert_rows", insert_rows)
+    with pytest.raises(KeyboardInterrupt):
+        backend.import_csv(opened_csv(csv_files), batch_size=100)
+    backend.close()
+
+    reopened = make_backend("sqlite", db_path=db_path, **csv_files)
+    csv = opened_csv(csv_files)
+    for table in ("purchase", "sale"):
+        assert len(reopened.read(table)) == len(csv.read(table))
+    assert reopened.import_csv(csv) is False
+    reopened.close()
+
+
+def test_rows_left_by_a_per_batch_import_are_replaced(tmp_path, csv_files):
+    db_path = str(tmp_path / "aaa_traders.db")
+    backend = SqliteBackend(db_path)
+    backend.ensure()
+    partial = pd.read_csv(csv_files["purchase_file"]).head(50)
+    backend.append_many("purchase", partial.to_dict("records"))
+    assert backend.import_csv(opened_csv(csv_files)) is True
+    assert len(backend.read("purchase")) == len(opened_csv(csv_files).read("purchase"))
+    backend.close()
+
+
+@pytest.fixture(params=["csv", "sqlite"])
+def backend(request, tmp_path, csv_files):
+    backend = make_backend(request.param, db_path=str(tmp_path / "aaa_traders.db"), **csv_files)
+    backend.ensure()
+    yield backend
+    backend.close()
+
+
+def key_filtered(df, columns, keys):
+    normalized = df[columns].astype(str).apply(lambda col: col.str.strip().str.lower())
+    return df[[tuple(row) in keys for row in normalized.itertuples(index=False, name=None)]]
+
+
+def test_keyed_read_follows_appends_and_deletes(backend):
+    sales = backend.read("sale")
+    first = sales.iloc[0]
+    keys = {(first["Item Sold"].lower(), first["Company"].lower(), str(first["Model"]).lower())}
+    backend.read("sale", keys=keys)
+    row = first.drop("ID", errors="ignore").to_dict()
+    row["Item Sold"] = row["Item Sold"].upper()
+    backend.append_many("sale", [row])
+    backend.delete("sale", [sales.index[0]])
+    columns = ["Item Sold", "Company", "Model"]
+    want = key_filtered(backend.read("sale"), columns, keys)
+    got = backend.read("sale", ["Units Sold"], keys=keys)
+    assert list(got.index) == list(want.index) and row["ID"] in got.index and sales.index[0] not in got.index
+    assert list(got["Units Sold"]) == list(want["Units Sold"])
+    assert backend.read("sale", keys=set()).empty
+
+
+def edit_in_place(path, old, new):
+    # Same-length edit made outside the app
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(old) == len(new) and data.count(old) >= 1
+    with open(path, "wb") as f:
+        f.write(data.replace(old, new, 1))
+
+
+def test_snapshot_is_rebuilt_after_an_outside_edit(tmp_path, csv_files):
+    purchases, sales, models = generate_ledgers(30000, seed=2)
+    purchases["Price Per Unit"] = 100.0
+    purchases.loc[10, "Price Per Unit"] = 123.0
+    files = write_ledgers(str(tmp_path), purchases, sales, models)
+    backend = opened_csv(files)
+    assert (backend.read("purchase")["Price Per Unit"] == 123.0).sum() == 1
+    snapshot = backend.ledgers["purchase"].snapshot
+    # Unchanged file: trusted without hashing the CSV again
+    backend.read("purchase")
+    assert snapshot.bytes_read == os.path.getsize(snapshot.path)
+
+    edit_in_place(files["purchase_file"], b",123.0,", b",900.0,")
+    assert (backend.read("purchase")["Price Per Unit"] == 900.0).sum() == 1
+    edit_in_place(files["purchase_file"], b",900.0,", b",901.0,")
+    assert (opened_csv(files).read("purchase")["Price Per Unit"] == 901.0).sum() == 1
+
+
+def test_snapshot_stays_trusted_across_own_appends(csv_files, monkeypatch):
+    backend = opened_csv(csv_files)
+    rows = backend.read("sale")
+    snapshot = backend.ledgers["sale"].snapshot
+    monkeypatch.setattr(snapshot, "fingerprint", lambda offset: pytest.fail("CSV hashed again"))
+    backend.append_many("sale", [rows.iloc[0].to_dict()])
+    assert len(backend.read("sale")) == len(rows) + 1
+
+
+def test_marker_changes_on_a_same_size_edit(csv_files):
+    backend = opened_csv(csv_files)
+    before = backend.marker("sale")
+    with open(csv_files["sale_file"], "rb") as f:
+        data = f.read()
+    with open(csv_files["sale_file"], "wb") as f:
+        f.write(data)
+    os.utime(csv_files["sale_file"], ns=(before[1] + 1000, before[1] + 1000))
+    assert backend.marker("sale") != before
+
+
+def test_fetch_returns_only_live_records_by_id(backend):
+    records = backend.read("sale")
+    ids = list(records.index)
+    gone = ids[3:6]
+    backend.delete("sale", gone)
+    wanted = ids[:10] + [ids[-1], 0, -5, 10 ** 9]
+    fetched = backend.fetch("sale", wanted)
+    expected = [record_id for record_id in sorted(set(wanted)) if record_id in ids and record_id not in gone]
+    assert list(fetched.index) == expected
+    pd.testing.assert_frame_equal(fetched, backend.read("sale").loc[expected], check_dtype=False,
+                                  check_categorical=False)
+    assert backend.fetch("sale", []).empty
@@ -0,0 +1,51 @@
+import tkinter as tk
+import pandas as pd
+import pytest
+from table_view import VirtualTable, filter_sort
+from worker import BackgroundWorker
+
+
+def records():
+    return pd.DataFrame({"Item": ["Laptop", "Mobile", "laptop bag", "Tablet"], "Units": [3, 1, 2, 5]},
+                        index=[10, 11, 12, 13])
+
+
+def test_filter_sort_matches_any_column_and_sorts_stably():
+    view = filter_sort(records(), "lap", "Units", ascending=False)
+    assert list(view.index) == [10, 12]
+    assert list(filter_sort(records(), "", "Item").index) == [10, 11, 13, 12]
+    assert list(filter_sort(records(), "5").index) == [13]
+
+
+@pytest.fixture
+def root():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    root.withdraw()
+    yield root
+    root.destroy()
+
+
+def pump(root, until):
+    for _ in range(400):
+        root.update()
+        if until():
+            return
+        root.after(5)
+    raise AssertionError("view never refreshed")
+
+
+def test_filter_runs_on_the_worker_and_only_the_latest_result_is_shown(root):
+    worker = BackgroundWorker(root)
+    table = VirtualTable(tk.Frame(root), records(), worker=worker)
+    table.filter_var.set("mobile")
+    table.refresh_view()
+    table.filter_var.set("lap")
+    table.refresh_view()
+    table.remove_rows([12])
+    pump(root, lambda: len(table.view) != 3)
+    assert list(table.view.index) == [10]
+    assert sorted(table.keys.values()) == [10]
+    worker.shutdown()
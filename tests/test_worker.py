@@ -0,0 +1,49 @@
+import time
+from worker import BackgroundWorker
+
+
+# Stands in for the Tk root: after() callbacks run when step() is called
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+        self.reported = []
+
+    def after(self, ms, func):
+        self.scheduled.append(func)
+
+    def report_callback_exception(self, exc_type, exc, tb):
+        self.reported.append(exc)
+
+    def step(self):
+        scheduled, self.scheduled = self.scheduled, []
+        for func in scheduled:
+            func()
+
+
+def wait_for_results(worker, count):
+    deadline = time.monotonic() + 5
+    while worker.results.qsize() < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_a_failing_callback_does_not_stop_later_results():
+    root = FakeRoot()
+    busy = []
+    worker = BackgroundWorker(root, on_busy=busy.append)
+    delivered = []
+
+    def fail(result):
+        raise RuntimeError("bad callback")
+
+    worker.write(lambda: 1, on_done=fail)
+    worker.write(lambda: 2, on_done=delivered.append)
+    worker.write(lambda: 1 / 0, on_error=fail)
+    wait_for_results(worker, 3)
+    root.step()
+    worker.write(lambda: 3, on_done=delivered.append)
+    wait_for_results(worker, 1)
+    root.step()
+    assert delivered == [2, 3]
+    assert [str(exc) for exc in root.reported] == ["bad callback", "bad callback"]
+    assert worker.pending == 0 and busy[-1] is False
+    worker.shutdown()
@@ -0,0 +1,69 @@
+import queue
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Runs storage and reporting work off the Tk event loop. Reads use a small
+# thread pool; writes go to a single thread so they are applied one at a time
+# in submission order. Results are handed back through a queue that the Tk
+# thread polls with root.after, so callbacks always run on the main thread.
+class BackgroundWorker:
+    def __init__(self, root, max_readers=4, poll_ms=50, on_busy=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self.readers = ThreadPoolExecutor(max_workers=max_readers, thread_name_prefix="aaa-read")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aaa-write")
+        self.results = queue.Queue()
+        self.pending = 0
+        self.running = True
+        self.root.after(self.poll_ms, self.poll)
+
+    def submit(self, func, *args, on_done=None, on_error=None, write=False, **kwargs):
+        executor = self.writer if write else self.readers
+        self.pending += 1
+        self.notify_busy()
+        future = executor.submit(func, *args, **kwargs)
+        future.add_done_callback(lambda f: self.results.put((f, on_done, on_error)))
+        return future
+
+    def read(self, func, *args, **kwargs):
+        return self.submit(func, *args, write=False, **kwargs)
+
+    def write(self, func, *args, **kwargs):
+        return self.submit(func, *args, write=True, **kwargs)
+
+    def poll(self):
+        if not self.running:
+            return
+        try:
+            while True:
+                try:
+                    future, on_done, on_error = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                self.pending -= 1
+                error = future.exception()
+                try:
+                    if error is not None:
+                        if on_error:
+                            on_error(error)
+                    elif on_done:
+                        on_done(future.result())
+                except Exception:
+                    # A failing callback is reported like any Tk callback
+                    # error; the results queued behind it are still delivered
+                    self.root.report_callback_exception(*sys.exc_info())
+                finally:
+                    self.notify_busy()
+        finally:
+            self.root.after(self.poll_ms, self.poll)
+
+    def notify_busy(self):
+        if self.on_busy:
+            self.on_busy(self.pending > 0)
+
+    def shutdown(self, wait=True):
+        self.running = False
+        self.readers.shutdown(wait=wait)
+        self.writer.shutdown(wait=wait)